@@ -0,0 +1,21 @@
+"""処理時間を計測するベンチマーク
+
+再現可能な合成軌道(S字曲線、リサージュ図形、ノイズの乗った舞踊のような軌道)を
+10^2から10^6フレームまでの大きさで生成し、
+パイプラインの各ステージと、その中で使われている基本的な関数の処理時間を計測します.
+
+* :py:mod:`benchmark.trajectories`: 合成軌道の生成
+* :py:mod:`benchmark.primitives`: value, coefficients, calc_delta, TotalCurvature, frame_getなどの計測
+* :py:mod:`benchmark.stages`: approximate, analyze_curvature, similarity, value_calcの計測
+* :py:mod:`benchmark.report`: スケーリングの指数の推定と、保存したベースラインとの比較
+
+結果はjsonで出力されます.ベースラインより遅くなった計測があった場合は終了コードが1になります.
+
+Examples:
+    リポジトリのルートで実行します.
+
+        $ python -m benchmark --output bench.json
+        $ python -m benchmark --save-baseline  # benchmark/baseline.jsonに保存
+        $ python -m benchmark --sizes 100,1000 --stage-sizes 100 --baseline benchmark/baseline.json
+"""
+from .trajectories import generate, save_trajectory, KINDS
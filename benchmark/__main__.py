@@ -0,0 +1,82 @@
+"""ベンチマークを実行します.
+
+使い方は :py:mod:`benchmark` を参照してください.
+"""
+import os
+import sys
+import argparse
+from .trajectories import generate, KINDS
+from .primitives import run_primitives
+from .stages import run_stages
+from .report import (
+    build_meta, calc_scaling, compare_baseline, load_report, save_report
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+"""str: ベースラインを保存するファイル
+"""
+
+def parse_sizes(s):
+    return [int(float(v)) for v in s.split(",") if v]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    parser.add_argument("--sizes", default="1e2,1e3,1e4,1e5,1e6",
+                        help="基本的な関数を計測するフレーム数(カンマ区切り)")
+    parser.add_argument("--stage-sizes", default="1e2,1e3",
+                        help="パイプラインの各ステージを計測するフレーム数(カンマ区切り)")
+    parser.add_argument("--kinds", default=",".join(KINDS),
+                        help="合成軌道の種類(カンマ区切り)")
+    parser.add_argument("--repeat", type=int, default=3, help="基本的な関数の計測の回数")
+    parser.add_argument("--seed", type=int, default=0, help="合成軌道の乱数のseed")
+    parser.add_argument("--output", default=None, help="計測結果を保存するjsonファイル")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="比較するベースライン")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="計測結果をベースラインとして保存します")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="ベースラインに対してこの割合以上遅くなったら報告します")
+    args = parser.parse_args(argv)
+
+    kinds = [k for k in args.kinds.split(",") if k]
+    results = []
+    for kind in kinds:
+        for size in parse_sizes(args.sizes):
+            traj = generate(kind, size, args.seed)
+            for name, seconds in run_primitives(traj, args.repeat).items():
+                results.append({"group": "primitive", "name": name, "kind": kind,
+                                "size": size, "seconds": seconds})
+                print(f"primitive {name:>18} {kind:>10} {size:>8} {seconds:.6f}s", file=sys.stderr)
+        for size in parse_sizes(args.stage_sizes):
+            traj = generate(kind, size, args.seed)
+            timings, error = run_stages(traj)
+            for name, seconds in timings.items():
+                r = {"group": "stage", "name": name, "kind": kind,
+                     "size": size, "seconds": seconds}
+                if seconds is None:
+                    r["error"] = error
+                    print(f"stage     {name:>18} {kind:>10} {size:>8} failed ({error})", file=sys.stderr)
+                else:
+                    print(f"stage     {name:>18} {kind:>10} {size:>8} {seconds:.6f}s", file=sys.stderr)
+                results.append(r)
+
+    report = {
+        "meta": build_meta(),
+        "results": results,
+        "scaling": calc_scaling(results),
+        "regressions": []
+    }
+    if args.save_baseline:
+        save_report(args.baseline, report)
+    elif os.path.exists(args.baseline):
+        report["regressions"] = compare_baseline(
+            results, load_report(args.baseline), args.tolerance
+        )
+        for r in report["regressions"]:
+            print(f"regression {r['group']} {r['name']} {r['kind']} {r['size']}: "
+                  f"{r['baseline']:.6f}s -> {r['seconds']:.6f}s (x{r['ratio']:.2f})", file=sys.stderr)
+    if args.output is not None:
+        save_report(args.output, report)
+    return 1 if report["regressions"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
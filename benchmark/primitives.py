@@ -0,0 +1,126 @@
+"""基本的な関数の処理時間を計測します.
+
+フレーム数mの合成軌道に対して、制御点の数がmに比例する(上限あり)B-spline曲線を作り、
+パイプラインの中で繰り返し呼ばれる関数を計測します.
+スカラーの媒介変数を受け取る関数(value, coefficients)は、一定回数の呼び出しにかかる時間を計測します.
+"""
+import time
+import numpy as np
+from src.bspline.base import BSpline, value, values, coefficients
+from src.bspline.lspia import (
+    calc_delta, create_ordered_point_param, create_knot_vector, create_default_P
+)
+from src.bspline.polynomial import compile_bspline
+from src.common.total_curvature import TotalCurvature
+from src.common.parameter_to_frame import parameter_get, frame_get
+
+N_SCALAR_CALLS = 200
+"""int: value, coefficientsを呼び出す回数
+"""
+
+N_INTERVALS = 10
+"""int: TotalCurvatureを計算する区間の数
+"""
+
+INTERVAL_WIDTH = 0.01
+"""float: TotalCurvatureを計算する区間の幅(媒介変数)
+"""
+
+def time_call(func, repeat=3):
+    """関数の処理時間を計測します
+
+    Args:
+        func (function): 引数無しで呼び出す関数
+        repeat (int): 計測の回数
+
+    Returns:
+        float: 最も短かった処理時間(秒)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def build_fixture(traj, p=4, max_ctrls=2000):
+    """計測に使うB-spline曲線などを作ります
+
+    制御点は点列を等分して平均したもので、近似は行いません.
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        p (int): Bスプラインの次数
+        max_ctrls (int): 制御点の数の上限
+
+    Returns:
+        dict: 点列, 媒介変数, ノットベクトル, 制御点など
+    """
+    Q = traj[:, 1:]
+    t = create_ordered_point_param(Q)
+    n = int(np.clip(Q.shape[0] // 10, p + 1, max_ctrls)) - 1
+    knots = create_knot_vector(n, p, t)
+    P = create_default_P(Q, n)
+    return {"Q": Q, "t": t, "p": p, "knots": knots, "P": P}
+
+def build_frame_json(t, n_curves=5):
+    """frame_getに渡す解析結果を作ります
+
+    Args:
+        t (array): 媒介変数
+        n_curves (int): 曲線の数
+
+    Returns:
+        dict: frame_getが参照するフィールドだけを持つ解析結果
+    """
+    edges = np.linspace(0.0, 1.0, n_curves + 2)
+    curves = []
+    for a, b, c in zip(edges, edges[1:], edges[2:]):
+        curves.append({
+            "ts": [a, b, c],
+            "arcs": [
+                {"trim_ts": [(a + b) / 2.0, b]},
+                {"trim_ts": [b, (b + c) / 2.0]}
+            ]
+        })
+    return {
+        "bspline": {"parameter": t.tolist()},
+        "total_curvature_analysis": {"curves": curves}
+    }
+
+def run_primitives(traj, repeat=3):
+    """基本的な関数の処理時間を計測します
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        repeat (int): 計測の回数
+
+    Returns:
+        dict: 関数名と処理時間(秒)
+    """
+    fx = build_fixture(traj)
+    p, knots, P, t, Q = fx["p"], fx["knots"], fx["P"], fx["t"], fx["Q"]
+    us = np.linspace(0.0, 1.0, N_SCALAR_CALLS)
+    n = P.shape[0] - 1
+
+    pbsp = compile_bspline(BSpline(p, knots, P[:, :2]))
+    tc = TotalCurvature(pbsp)
+    starts = np.linspace(0.0, 1.0 - INTERVAL_WIDTH, N_INTERVALS)
+
+    json_data = build_frame_json(t)
+    n_curves = len(json_data["total_curvature_analysis"]["curves"])
+
+    def run_frame_get():
+        for i in range(n_curves):
+            frame_get(json_data, 0, *parameter_get(json_data, i))
+
+    return {
+        "value": time_call(lambda: [value(p, knots, P, u) for u in us], repeat),
+        "coefficients": time_call(lambda: [coefficients(n, p, knots, u) for u in us], repeat),
+        "values": time_call(lambda: values(p, knots, P, t), repeat),
+        "calc_delta": time_call(lambda: calc_delta(Q, p, knots, P, t), repeat),
+        "TotalCurvature": time_call(
+            lambda: [tc(a, a + INTERVAL_WIDTH) for a in starts], repeat
+        ),
+        "frame_get": time_call(run_frame_get, repeat)
+    }
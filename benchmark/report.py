@@ -0,0 +1,125 @@
+"""計測結果の集計と、ベースラインとの比較を行います.
+
+計測結果は次のような辞書として扱い、そのままjsonで保存します.
+
+.. code-block:: json
+
+    {
+        "meta": {"python": "", "numpy": "", "platform": "", "date": ""},
+        "results": [
+            {"group": "primitive", "name": "value", "kind": "s_curve", "size": 1000, "seconds": 0.0}
+        ],
+        "scaling": [
+            {"group": "primitive", "name": "value", "kind": "s_curve", "exponent": 1.0}
+        ],
+        "regressions": []
+    }
+
+ステージの途中で例外が発生した場合、そのステージの"seconds"はnullになり、
+"error"に例外の内容が入ります.
+"exponent"は処理時間をフレーム数に対して両対数でフィットした傾きで、
+1ならフレーム数に比例、2なら2乗に比例して処理時間が増えることを表します.
+"""
+import json
+import time
+import platform
+import numpy as np
+
+def build_meta():
+    """計測した環境の情報を返します
+
+    Returns:
+        dict: pythonやnumpyのバージョンなど
+    """
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+def result_key(r):
+    """計測結果を識別するキーを返します
+
+    Args:
+        r (dict): 1つの計測結果
+
+    Returns:
+        tuple: (group, name, kind, size)
+    """
+    return (r["group"], r["name"], r["kind"], r["size"])
+
+def calc_scaling(results, min_seconds=1e-4):
+    """フレーム数に対する処理時間の増え方を推定します
+
+    Args:
+        results (List[dict]): 計測結果
+        min_seconds (float): これより短い計測は誤差が大きいため使いません
+
+    Returns:
+        List[dict]: (group, name, kind)ごとの両対数での傾き
+    """
+    series = {}
+    for r in results:
+        if r["seconds"] is not None and r["seconds"] >= min_seconds:
+            series.setdefault((r["group"], r["name"], r["kind"]), []).append(
+                (r["size"], r["seconds"])
+            )
+    scaling = []
+    for (group, name, kind), points in sorted(series.items()):
+        if len(points) < 2:
+            continue
+        sizes, seconds = np.log(np.array(points)).T
+        exponent = np.polyfit(sizes, seconds, 1)[0]
+        scaling.append({
+            "group": group,
+            "name": name,
+            "kind": kind,
+            "exponent": float(exponent)
+        })
+    return scaling
+
+def compare_baseline(results, baseline, tolerance=0.25, min_seconds=1e-3):
+    """ベースラインより遅くなった計測を探します
+
+    Args:
+        results (List[dict]): 計測結果
+        baseline (dict): 保存しておいた計測結果
+        tolerance (float): ベースラインに対してこの割合以上遅くなったものを報告します
+        min_seconds (float): ベースラインがこれより短い計測は誤差が大きいため比較しません
+
+    Returns:
+        List[dict]: 遅くなった計測と、ベースラインに対する比
+    """
+    base = {result_key(r): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        key = result_key(r)
+        if r["seconds"] is None or base.get(key) is None or base[key] < min_seconds:
+            continue
+        ratio = r["seconds"] / base[key]
+        if ratio > 1.0 + tolerance:
+            regressions.append(dict(r, baseline=base[key], ratio=ratio))
+    return regressions
+
+def load_report(path):
+    """保存した計測結果を読み込みます
+
+    Args:
+        path (str): ファイルパス
+
+    Returns:
+        dict: 計測結果
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_report(path, report):
+    """計測結果を保存します
+
+    Args:
+        path (str): ファイルパス
+        report (dict): 計測結果
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, sort_keys=True, indent=4)
@@ -0,0 +1,61 @@
+"""パイプラインの各ステージの処理時間を計測します.
+
+main.pyと同じ順にapproximate, analyze_curvature, similarity, value_calcを呼び出し、
+それぞれの処理時間を計測します.入出力は一時ディレクトリに書き込みます.
+srcをimportするため、リポジトリのルートで実行してください.
+途中のステージで例外が発生した場合(短すぎる軌道で美の線要素が見つからない場合など)は、
+そのステージの処理時間をNoneとし、以降のステージは計測しません.
+"""
+import os
+import time
+import tempfile
+import contextlib
+from src.approximate_trajectories import approximate
+from src.total_curvature_analysis import analyze_curvature
+from src.degree_of_similarity import similarity
+from src.evaluation_value_calc import value_calc
+from .trajectories import save_trajectory
+
+def run_stages(traj, average_error=10, lr=1e-3, quiet=True):
+    """パイプラインの各ステージの処理時間を計測します
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        average_error (float): 元軌道1点あたりの誤差
+        lr (float): 収束判定に使う、average_errorに対する比
+        quiet (bool): Trueなら各ステージの進捗表示(標準出力と標準エラー出力)を捨てます
+
+    Returns:
+        dict, str: ステージ名と処理時間(秒), 例外が発生した場合はその内容(無ければNone)
+    """
+    timings = {}
+    error = None
+    with tempfile.TemporaryDirectory() as d:
+        ipath = os.path.join(d, "bench.csv")
+        apath = os.path.join(d, "axis.json")
+        bpath = os.path.join(d, "bspline.csv")
+        rpath = os.path.join(d, "result.json")
+        spath = os.path.join(d, "similar.csv")
+        fpath = os.path.join(d, "output.csv")
+        save_trajectory(ipath, traj)
+        stages = [
+            ("approximate", lambda: approximate(ipath, apath, average_error, lr)),
+            ("analyze_curvature", lambda: analyze_curvature(apath, bpath, rpath)),
+            ("similarity", lambda: similarity(bpath, rpath, spath)),
+            ("value_calc", lambda: value_calc(spath, rpath, fpath))
+        ]
+        with open(os.devnull, "w") as devnull:
+            with contextlib.ExitStack() as stack:
+                if quiet:
+                    stack.enter_context(contextlib.redirect_stdout(devnull))
+                    stack.enter_context(contextlib.redirect_stderr(devnull))
+                for name, func in stages:
+                    start = time.perf_counter()
+                    try:
+                        func()
+                    except Exception as e:
+                        timings[name] = None
+                        error = f"{name}: {type(e).__name__}: {e}"
+                        break
+                    timings[name] = time.perf_counter() - start
+    return timings, error
@@ -0,0 +1,106 @@
+"""ベンチマーク用の合成軌道を生成します.
+
+どの軌道もフレーム数mに対して同じ形をしており、mが大きいほど細かくサンプリングされます.
+乱数は全てseedから作るため、同じ引数なら同じ軌道が得られます.
+出力は入力ファイルと同じ(frame, x, y, z)の列で、単位はmm程度を想定しています.
+"""
+import numpy as np
+
+def s_curve(m, seed=0):
+    """S字曲線が続く軌道を生成します
+
+    Args:
+        m (int): フレーム数
+        seed (int): 乱数のseed
+
+    Returns:
+        vector array: (frame, x, y, z)の列
+    """
+    rng = np.random.default_rng(seed)
+    u = np.linspace(0.0, 1.0, m)
+    x = 1000.0 * u
+    y = 150.0 * np.sin(6.0 * np.pi * u) * (1.0 + 0.3 * u)
+    z = 50.0 * np.cos(2.0 * np.pi * u)
+    Q = np.c_[x, y, z] + rng.normal(scale=0.5, size=(m, 3))
+    return np.c_[np.arange(1, m + 1), Q]
+
+def lissajous(m, seed=0):
+    """リサージュ図形の軌道を生成します
+
+    Args:
+        m (int): フレーム数
+        seed (int): 乱数のseed
+
+    Returns:
+        vector array: (frame, x, y, z)の列
+    """
+    rng = np.random.default_rng(seed)
+    s = np.linspace(0.0, 2.0 * np.pi, m)
+    x = 300.0 * np.sin(3.0 * s + np.pi / 2.0)
+    y = 200.0 * np.sin(2.0 * s)
+    z = 100.0 * np.sin(5.0 * s)
+    Q = np.c_[x, y, z] + rng.normal(scale=0.5, size=(m, 3))
+    return np.c_[np.arange(1, m + 1), Q]
+
+def dance(m, seed=0, n_modes=8):
+    """ノイズの乗った舞踊のような軌道を生成します
+
+    乱数で決めた振幅と周波数の正弦波を重ね合わせ、
+    ところどころで速度が落ちる(ほとんど止まる)ようにした軌道です.
+
+    Args:
+        m (int): フレーム数
+        seed (int): 乱数のseed
+        n_modes (int): 重ね合わせる正弦波の数
+
+    Returns:
+        vector array: (frame, x, y, z)の列
+    """
+    rng = np.random.default_rng(seed)
+    u = np.linspace(0.0, 1.0, m)
+    # 速度が周期的に落ちるように時間を歪めます
+    w = u - np.sin(8.0 * np.pi * u) / (8.0 * np.pi)
+    freqs = rng.uniform(1.0, 6.0, size=(n_modes, 3))
+    amps = rng.uniform(20.0, 200.0, size=(n_modes, 3)) / np.arange(1, n_modes + 1)[:, None]
+    phases = rng.uniform(0.0, 2.0 * np.pi, size=(n_modes, 3))
+    Q = np.sum(
+        amps[None] * np.sin(2.0 * np.pi * freqs[None] * w[:, None, None] + phases[None]),
+        axis=1
+    )
+    Q += rng.normal(scale=2.0, size=(m, 3))
+    return np.c_[np.arange(1, m + 1), Q]
+
+KINDS = {
+    "s_curve": s_curve,
+    "lissajous": lissajous,
+    "dance": dance
+}
+"""dict: 軌道の種類と生成する関数
+"""
+
+def generate(kind, m, seed=0):
+    """種類を指定して合成軌道を生成します
+
+    Args:
+        kind (str): 軌道の種類("s_curve", "lissajous", "dance")
+        m (int): フレーム数
+        seed (int): 乱数のseed
+
+    Returns:
+        vector array: (frame, x, y, z)の列
+
+    Raises:
+        ValueError: 対応していない種類の場合に発生
+    """
+    if kind not in KINDS:
+        raise ValueError("unknown trajectory kind: " + str(kind))
+    return KINDS[kind](m, seed)
+
+def save_trajectory(path, traj):
+    """入力ファイルと同じ形式のcsvとして保存します
+
+    Args:
+        path (str): 保存先のファイルパス
+        traj (vector array): (frame, x, y, z)の列
+    """
+    np.savetxt(path, traj, delimiter=",")
@@ -1,32 +1,110 @@
 avarage_error, lr = 10, 1e-3 #自由に変えて下さい 初期値: 0.001, 1e-3
+chunk_size, overlap, workers = None, 200, 1 #長い軌道を窓に分割して近似する場合はchunk_sizeに窓の点数を入れて下さい
+batch_fit = False #Trueにすると全てのファイルの近似をまとめて行います(短い軌道が大量にある場合に速くなります)
+weighting, momentum = 'global', 0.0 #LSPIAの収束を速める場合は 'diagonal'(制御点ごとの重み) や momentum=0.5 など
+preprocess = None #{'min_move': 0.1, 'outlier_k': 10.0, 'chord_tol': 1.0} のようにすると近似の前に静止したフレームなどを取り除きます
+coarse_factor = None #10などにすると間引いた軌道で粗く近似してから元の軌道で仕上げます(点数の多い軌道で速くなります)
+archive_format = 'json' #'npz'にするとarchive/axis, archive/resultを配列をバイナリで格納した形式で保存します
+sample_format = 'csv' #'npy'にするとarchive/bsplineを固定長のバイナリで保存し，メモリマップで読み込みます
+curvature_method = 'quad' #全曲率の計算方法 'quad': 曲率の数値積分, 'angle': 変曲点間の接線角の差(数値積分より速く，値は積分の誤差程度異なります)
+similarity_method = 'samples' #'spline'にすると類似度をarchive/bsplineのサンプル点ではなく，B-splineの解析的な微分から弧長で等間隔な点で計算します(値は'samples'と異なります)
+viewport_planes = None #複数の視点平面をまとめて解析する場合は ['xy', '-zy', 'yz'] のように入れて下さい
+profile = False #Trueにするとステージごとの処理時間や呼び出し回数を archive/profile/{ファイル名}.json に出力します
+async_write = False #Trueにするとarchive, outputへの書き込みをバックグラウンドで行います
+index_db = None #'archive/index.sqlite'のようにすると曲線ごとの結果を1つのデータベースにまとめます(python -m src.curve_index archive/index.sqlite で評価値の高い曲線を表示)
 #途中で絶対止まるのでファイルは１個ずつ実行すること
-#outputは直で上書きするので都度削除すること
+#python main.py score のようにステージを選ぶと，そのステージに必要なモジュールだけをimportして実行します(既定は all)
+#全曲率の閾値を変えて評価値を比べる場合は python -m src.threshold_sweep archive/axis/{ファイル名}.json --result archive/result/{ファイル名}.json --under 40 50 --best 70 75 80 を使って下さい
+#outputは一時ファイルに書き込んでから置き換えるので，途中で止まっても書きかけのファイルは残りません
 
 import os
-from src.approximate_trajectories import approximate
-from src.total_curvature_analysis import analyze_curvature
-from src.evaluation_value_calc import value_calc
-from src.degree_of_similarity import similarity
+import sys
+import time
+import argparse
+import importlib
+
+#ステージごとに必要な関数.選んだステージの分だけimportします
+STAGES = {
+    'fit': ('src.approximate_trajectories', ['approximate', 'approximate_batch']),
+    'analyze': ('src.total_curvature_analysis', ['analyze_curvature']),
+    'similarity': ('src.degree_of_similarity', ['similarity']),
+    'score': ('src.evaluation_value_calc', ['value_calc']),
+    'index': ('src.curve_index', ['index_curves']),
+}
+import_times = {}
+
+def lazy_import(module, names):
+    start = time.perf_counter()
+    mod = importlib.import_module(module)
+    import_times[module] = time.perf_counter() - start
+    return [getattr(mod, n) for n in names]
+
+parser = argparse.ArgumentParser(description='input以下の軌道を近似・解析・評価します')
+parser.add_argument('stage', nargs='?', default='all', choices=list(STAGES) + ['all'],
+                    help='実行するステージ(fit: 近似, analyze: 全曲率の解析, similarity: 類似度, score: 評価値, index: データベースへの取り込み, all: 全て)')
+parser.add_argument('--import-time', action='store_true', help='importにかかった時間を表示します')
+args = parser.parse_args()
+selected = list(STAGES) if args.stage == 'all' else [args.stage]
+if args.stage == 'all' and index_db is None:
+    selected.remove('index')
+
+enable_async_writer, disable_async_writer = lazy_import('src.common.writer', ['enable_async_writer', 'disable_async_writer'])
+enable_profiler, stage, save_profile = lazy_import('src.common.profiler', ['enable_profiler', 'stage', 'save_profile'])
+funcs = {}
+for s in selected:
+    module, names = STAGES[s]
+    funcs.update(zip(names, lazy_import(module, names)))
+if args.import_time:
+    for module, t in import_times.items():
+        print(f'import {module} -> {t:.3f}s', file=sys.stderr)
 
 target = os.listdir('input')
 if len(target) < 1:
     print('csv fileを1つ以上入れて下さい')
 else:
-    for t in target:
-        print(f'target -> {t}')
-        t = t.replace('.csv', '')
+    if async_write:
+        enable_async_writer()
+    if profile:
+        enable_profiler()
+    names = [t.replace('.csv', '') for t in target]
+    if 'fit' in selected and batch_fit:
+        print('doing approximate (batch)')
+        with stage('approximate'):
+            funcs['approximate_batch'](
+                [f'input/{t}.csv' for t in names],
+                [f'archive/axis/{t}.{archive_format}' for t in names],
+                avarage_error, lr, weighting, momentum, preprocess
+            )
+        save_profile('archive/profile/batch.json')
+        print()
+    for t in names:
+        print(f'target -> {t}.csv')
         ipath = f'input/{t}.csv'
-        apath = f'archive/axis/{t}.json'
-        bpath = f'archive/bspline/{t}.csv'
-        rpath = f'archive/result/{t}.json'
+        apath = f'archive/axis/{t}.{archive_format}'
+        bpath = f'archive/bspline/{t}.{sample_format}'
+        rpath = f'archive/result/{t}.{archive_format}'
         spath = f'archive/similar/{t}.csv'
         fpath = f'output/{t}.csv'
-        print('doing approximate')
-        approximate(ipath, apath, avarage_error, lr)
-        print('\ndoing analyze_curvature')
-        analyze_curvature(apath, bpath, rpath)
-        print('doing similarity')
-        similarity(bpath, rpath, spath)
-        print('doing score_curvature')
-        value_calc(spath, rpath, fpath)
+        if 'fit' in selected and not batch_fit:
+            print('doing approximate')
+            with stage('approximate'):
+                funcs['approximate'](ipath, apath, avarage_error, lr, chunk_size, overlap, workers, weighting, momentum, coarse_factor, preprocess)
+        if 'analyze' in selected:
+            print('\ndoing analyze_curvature')
+            with stage('analyze_curvature'):
+                funcs['analyze_curvature'](apath, bpath, rpath, curvature_method, viewport_planes)
+        if 'similarity' in selected:
+            print('doing similarity')
+            with stage('similarity'):
+                funcs['similarity'](bpath, rpath, spath, similarity_method)
+        if 'score' in selected:
+            print('doing score_curvature')
+            with stage('score_curvature'):
+                funcs['value_calc'](spath, rpath, fpath)
+        if 'index' in selected:
+            print('doing index')
+            with stage('index'):
+                funcs['index_curves'](index_db or 'archive/index.sqlite', t, rpath, spath, fpath)
+        save_profile(f'archive/profile/{t}.json')
         print('\ndone\n')
+    disable_async_writer()
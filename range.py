@@ -1,27 +1,24 @@
 # 評価値から美の曲線グラフを作るプログラム
-import json, matplotlib.pyplot as plt, numpy as np
-from src.common.parameter_to_frame import parameter_get, frame_get
+import matplotlib.pyplot as plt
+from src.common.parameter_to_frame import parameter_get, frame_get, original_frame_get
+from src.common.archive import load_archive, load_samples
 
 #ファイル名，変曲点のインデックス番号
 name = '06'
 i = 0
 
-bpath = f'archive/bspline/{name}.csv'
-rpath = f'archive/result/{name}.json'
-json_tca = open(rpath, 'r')
-json_data = json.load(json_tca)
+bpath = f'archive/bspline/{name}.csv' #npy形式で保存した場合は.npy
+rpath = f'archive/result/{name}.json' #npz形式で保存した場合は.npz
+json_data = load_archive(rpath)
 #isvalid = falseの場合は飛ばす
 
 ip1, t1, t2, t3, ip2 = parameter_get(json_data, i)
 print(ip1, t1, t2, t3, ip2)
 t_n_ip1, t_n_s, t_n_c, t_n_f, t_n_ip2 = frame_get(json_data, 0, ip1, t1, t2, t3, ip2)
 print(t_n_s, t_n_f)
+print(original_frame_get(json_data, t_n_s, t_n_f)) #前処理をした場合の入力ファイルの行番号
 
-pos = []
-with open(bpath) as f:
-    for s in f.read().split('\n')[t_n_s:t_n_f+1]:
-      pos.append(list(map(float, s.split(',')))[:2])
-pos = np.array(pos)
+pos = load_samples(bpath, t_n_s, t_n_f+1)[:, :2]
 plt.plot(pos[:,0], pos[:,1])
 plt.xlabel('pixel')
 plt.ylabel('pixel')
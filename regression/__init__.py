@@ -0,0 +1,44 @@
+"""最適化した処理が結果を変えていないことを確かめる回帰テスト
+
+同じ入力軌道に対して、基準となる設定(これまで通りの逐次的な処理)と、
+最適化した設定(バイナリ形式での保存、バックグラウンドでの書き込み、
+全曲率の計算方法の変更、LSPIAの重みの変更など)でパイプラインを実行し、
+archive/axis, archive/result, archive/similar, outputに相当する結果を比較します.
+
+比較する値は、制御点、ノットベクトル、変曲点、美の線要素の切り取り位置、
+弧長、全曲率、類似度、評価値です.
+許容誤差は値の種類ごとに設定できます.
+
+基準の設定の結果は、regression/golden/に保存してあるbaselineのコミット(c8554be)の
+結果と比べます.基準の設定も最適化した関数(ベクトル化したBスプラインの評価など)を通るため、
+最適化する前のスカラーの実装と一致することはこちらで確かめます.
+goldenの結果は、baselineのコミットをチェックアウトしたディレクトリで
+regression/golden/input/の軌道ごとに次のように作りました
+(errors.jsonには、その際に発生した例外を"例外の型: メッセージ"の形で記録しています).
+
+    >>> approximate(ipath, apath, 10, 1e-3)
+    >>> analyze_curvature(apath, bpath, rpath)
+    >>> similarity(bpath, rpath, spath)
+    >>> value_calc(spath, rpath, fpath)
+
+パイプラインの途中で例外が発生した場合は、比べる側でも同じ例外が発生していれば一致とみなします.
+
+* :py:mod:`regression.runner`: 設定を指定してパイプラインを実行し、結果を読み込みます
+* :py:mod:`regression.compare`: 2つの結果を許容誤差の範囲で比較します
+
+Examples:
+    リポジトリのルートで実行します.
+
+        $ python -m regression                          # goldenの軌道に対して既定の設定を比較
+        $ python -m regression --synthetic --size 1000  # 合成軌道に対して比較
+        $ python -m regression --variants npz,async --inputs input/01.csv
+        $ python -m regression --variants angle --rtol inflection=1e-3 --output report.json
+
+    結果が許容誤差の範囲に収まらなかった場合や、基準と違う例外が発生した場合は、
+    終了コードが1になります.
+"""
+from .runner import (
+    run_pipeline, run_case, load_outputs, load_golden, golden_inputs,
+    REFERENCE, VARIANTS, DEFAULT_VARIANTS, VARIANT_TOLERANCES, GOLDEN_DIR
+)
+from .compare import compare_outputs, compare_runs, DEFAULT_TOLERANCES
@@ -0,0 +1,111 @@
+"""回帰テストを実行します.
+
+使い方は :py:mod:`regression` を参照してください.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+from benchmark.trajectories import generate, save_trajectory, KINDS
+from .runner import (
+    run_case, golden_inputs, load_golden, VARIANTS, DEFAULT_VARIANTS, VARIANT_TOLERANCES
+)
+from .compare import compare_runs, DEFAULT_TOLERANCES
+
+def parse_tolerances(items):
+    """"field=値"の形式の許容誤差を読み取ります
+
+    Args:
+        items (List[str]): "field=値"の列
+
+    Returns:
+        dict: 値の種類と許容誤差
+    """
+    tols = {}
+    for item in items:
+        field, value = item.split("=")
+        if field not in DEFAULT_TOLERANCES:
+            raise ValueError("unknown field: " + field)
+        tols[field] = float(value)
+    return tols
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m regression")
+    parser.add_argument("--variants", default=",".join(DEFAULT_VARIANTS),
+                        help="比較する設定(カンマ区切り).選べる設定: " + ",".join(VARIANTS))
+    parser.add_argument("--inputs", nargs="*", default=[],
+                        help="入力の軌道のcsv.指定しなければbaselineの結果がある軌道を使います")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="baselineの結果がある軌道の代わりに合成軌道を使います")
+    parser.add_argument("--size", type=int, default=300, help="合成軌道のフレーム数")
+    parser.add_argument("--seed", type=int, default=0, help="合成軌道の乱数のseed")
+    parser.add_argument("--rtol", nargs="*", default=[], metavar="FIELD=VALUE",
+                        help="値の種類ごとの相対誤差")
+    parser.add_argument("--atol", nargs="*", default=[], metavar="FIELD=VALUE",
+                        help="値の種類ごとの絶対誤差")
+    parser.add_argument("--output", default=None, help="結果を保存するjsonファイル")
+    args = parser.parse_args(argv)
+
+    variants = [v for v in args.variants.split(",") if v]
+    for v in variants:
+        if v not in VARIANTS:
+            parser.error("unknown variant: " + v)
+    rtols, atols = parse_tolerances(args.rtol), parse_tolerances(args.atol)
+    tolerances = {}
+    for v in ["reference"] + variants:
+        tol = dict(DEFAULT_TOLERANCES, **VARIANT_TOLERANCES.get(v, {}))
+        tolerances[v] = {
+            field: (rtols.get(field, rtol), atols.get(field, atol))
+            for field, (rtol, atol) in tol.items()
+        }
+
+    report = {"tolerances": tolerances, "results": []}
+
+    def add_result(ipath, variant, mismatches):
+        report["results"].append({
+            "input": os.path.basename(ipath),
+            "variant": variant,
+            "ok": not mismatches,
+            "mismatches": mismatches
+        })
+        status = "ok" if not mismatches else f"{len(mismatches)} mismatches"
+        print(f"{os.path.basename(ipath):>16} {variant:>10}: {status}", file=sys.stderr)
+        for m in mismatches:
+            print(f"{'':>30}{m}", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as d:
+        inputs = list(args.inputs)
+        use_golden = not inputs and not args.synthetic
+        if use_golden:
+            inputs = golden_inputs()
+        elif not inputs:
+            for kind in KINDS:
+                path = os.path.join(d, f"{kind}.csv")
+                save_trajectory(path, generate(kind, args.size, args.seed))
+                inputs.append(path)
+        for ipath in inputs:
+            # 基準の設定はbaselineの結果と、他の設定は基準の設定の結果と比べます.
+            # どちらも、同じ例外が発生した場合は一致とみなします
+            expected, expected_error = run_case(ipath, os.path.join(d, "reference"))
+            if use_golden:
+                name = os.path.splitext(os.path.basename(ipath))[0]
+                golden, golden_error = load_golden(name)
+                add_result(ipath, "reference", compare_runs(
+                    expected, expected_error, golden, golden_error, tolerances["reference"]
+                ))
+            elif expected_error is not None:
+                print(f"{os.path.basename(ipath):>16}  reference: failed ({expected_error})",
+                      file=sys.stderr)
+            for v in variants:
+                outputs, error = run_case(ipath, os.path.join(d, v), VARIANTS[v])
+                add_result(ipath, v, compare_runs(
+                    outputs, error, expected, expected_error, tolerances[v]
+                ))
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, sort_keys=True, indent=4)
+    return 0 if all(r["ok"] for r in report["results"]) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""2つのパイプラインの結果を許容誤差の範囲で比較します.
+
+値の種類ごとに相対誤差(rtol)と絶対誤差(atol)を設定し、
+:math:`|a - b| \\le atol + rtol |b|` を満たすかどうかを調べます(bは基準の値).
+nanは同じ位置にnanがあれば一致しているとみなします.
+
+配列の形が違う場合(制御点の数が違う、曲線の数が違うなど)や、
+美の線要素かどうかの判定が違う場合は、許容誤差に関係なく不一致として報告します.
+片方だけがnanの値は、差が無限大として報告します.
+
+パイプラインの途中で例外が発生した場合は、同じ例外が発生していれば一致とみなし、
+それまでのステージの出力を比較します(:py:func:`compare_runs`).
+"""
+import numpy as np
+
+DEFAULT_TOLERANCES = {
+    "control_point": (1e-9, 1e-9),
+    "knot_vector": (1e-9, 1e-12),
+    "inflection_points": (1e-9, 1e-12),
+    "inflection": (1e-9, 1e-12),
+    "trim": (1e-9, 1e-12),
+    "length": (1e-9, 1e-9),
+    "total_curvature": (1e-9, 1e-9),
+    "similarity": (1e-9, 1e-12),
+    "score": (1e-9, 1e-9)
+}
+"""dict: 値の種類と(rtol, atol)の既定値
+"""
+
+def compare_arrays(field, a, b, tolerance):
+    """2つの配列を比較します
+
+    Args:
+        field (str): 値の名前
+        a (array): 比較する値
+        b (array): 基準の値
+        tolerance (Tuple[float, float]): (rtol, atol)
+
+    Returns:
+        dict or None: 不一致の内容.一致していればNone.
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    if a.shape != b.shape:
+        return {"field": field, "reason": "shape", "shape": list(a.shape), "expected_shape": list(b.shape)}
+    rtol, atol = tolerance
+    if np.allclose(a, b, rtol=rtol, atol=atol, equal_nan=True):
+        return None
+    diff = np.abs(a - b)
+    diff[np.isnan(a) & np.isnan(b)] = 0.0
+    rel = diff / np.maximum(np.abs(b), np.finfo(float).tiny)
+    diff[np.isnan(a) != np.isnan(b)] = np.inf
+    rel[np.isnan(a) != np.isnan(b)] = np.inf
+    return {
+        "field": field,
+        "reason": "value",
+        "max_abs_diff": float(np.nanmax(diff)) if diff.size else 0.0,
+        "max_rel_diff": float(np.nanmax(rel)) if rel.size else 0.0,
+        "rtol": rtol,
+        "atol": atol
+    }
+
+def compare_outputs(outputs, expected, tolerances=None):
+    """2つのパイプラインの結果を比較します
+
+    Args:
+        outputs (dict): 比較する結果(:py:func:`regression.runner.load_outputs` の返り値)
+        expected (dict): 基準の結果
+        tolerances (dict): 値の種類と(rtol, atol).指定しなかった種類は既定値を使います.
+
+    Returns:
+        List[dict]: 不一致の一覧.全て一致していれば空のリスト.
+    """
+    tol = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+    mismatches = []
+    for field in ("control_point", "knot_vector", "inflection_points", "similarity", "score", "curves"):
+        if (field in outputs) != (field in expected):
+            mismatches.append({
+                "field": field, "reason": "missing",
+                "present": field in outputs, "expected_present": field in expected
+            })
+    for field in ("control_point", "knot_vector", "inflection_points", "similarity", "score"):
+        if field not in outputs or field not in expected:
+            continue
+        m = compare_arrays(field, outputs[field], expected[field], tol[field])
+        if m is not None:
+            mismatches.append(m)
+    if "curves" not in outputs or "curves" not in expected:
+        return mismatches
+    curves, expected_curves = outputs["curves"], expected["curves"]
+    if len(curves) != len(expected_curves):
+        mismatches.append({
+            "field": "curves", "reason": "count",
+            "count": len(curves), "expected_count": len(expected_curves)
+        })
+        return mismatches
+    for i, (c, e) in enumerate(zip(curves, expected_curves)):
+        if c["is_valid"] != e["is_valid"]:
+            mismatches.append({
+                "field": f"curves[{i}].is_valid", "reason": "value",
+                "value": c["is_valid"], "expected": e["is_valid"]
+            })
+            continue
+        for field in ("inflection", "trim", "length", "total_curvature"):
+            m = compare_arrays(f"curves[{i}].{field}", c[field], e[field], tol[field])
+            if m is not None:
+                mismatches.append(m)
+    return mismatches
+
+def compare_runs(outputs, error, expected, expected_error, tolerances=None):
+    """例外の発生も含めて、2つのパイプラインの実行を比較します
+
+    両方で同じ例外が発生した場合は一致とみなし、両方に出力されている値だけを比較します.
+    評価値のファイルは書き出しの途中で止まっていることがあるため、この場合は比較しません.
+
+    Args:
+        outputs (dict): 比較する結果
+        error (str or None): 比較する実行で発生した例外
+        expected (dict): 基準の結果
+        expected_error (str or None): 基準の実行で発生した例外
+        tolerances (dict): 値の種類と(rtol, atol)
+
+    Returns:
+        List[dict]: 不一致の一覧.全て一致していれば空のリスト.
+    """
+    if error != expected_error:
+        return [{"field": None, "reason": "error", "error": error, "expected_error": expected_error}]
+    if error is not None:
+        fields = (set(outputs) & set(expected)) - {"score"}
+        outputs = {f: outputs[f] for f in fields}
+        expected = {f: expected[f] for f in fields}
+    return compare_outputs(outputs, expected, tolerances)
@@ -0,0 +1,271 @@
+"""設定を指定してパイプラインを実行し、比較に使う値を読み込みます.
+
+設定はmain.pyの先頭の変数と同じ名前を持つ辞書で表します.
+指定しなかった項目は :py:data:`REFERENCE` の値になります.
+
+:py:data:`GOLDEN_DIR` には、最適化を入れる前のコード(baselineのコミット)で
+基準の設定のパイプラインを実行した結果を保存しています.
+基準の設定自体も、この結果と比べて確かめます.
+"""
+import os
+import json
+import contextlib
+import numpy as np
+import pandas as pd
+from src.approximate_trajectories import approximate, approximate_batch
+from src.total_curvature_analysis import analyze_curvature
+from src.degree_of_similarity import similarity
+from src.evaluation_value_calc import value_calc
+from src.common.archive import load_archive
+from src.common.writer import enable_async_writer, disable_async_writer
+
+REFERENCE = {
+    "average_error": 10,
+    "lr": 1e-3,
+    "chunk_size": None,
+    "overlap": 200,
+    "workers": 1,
+    "batch_fit": False,
+    "weighting": "global",
+    "momentum": 0.0,
+    "coarse_factor": None,
+    "preprocess": None,
+    "archive_format": "json",
+    "sample_format": "csv",
+    "curvature_method": "quad",
+    "async_write": False
+}
+"""dict: 基準となる設定.これまで通りの逐次的な処理です.
+"""
+
+VARIANTS = {
+    "npz": {"archive_format": "npz", "sample_format": "npy"},
+    "async": {"async_write": True},
+    "angle": {"curvature_method": "angle"},
+    "batch": {"batch_fit": True},
+    "diagonal": {"weighting": "diagonal"},
+    "momentum": {"momentum": 0.5},
+    "coarse": {"coarse_factor": 4},
+    "chunk": {"chunk_size": 150, "overlap": 50}
+}
+"""dict: 比較する設定の名前と、基準の設定から変更する項目
+"""
+
+DEFAULT_VARIANTS = ("npz", "async", "batch", "angle")
+"""tuple: 既定で比較する設定.基準と同じ結果になるはずの設定です.
+diagonal, momentum, coarse, chunkは近似の途中の経路が変わるため、
+同じ誤差の基準を満たす別の曲線になります.指定した場合だけ比較します.
+"""
+
+VARIANT_TOLERANCES = {
+    "angle": {
+        "trim": (1e-6, 1e-12),
+        "length": (1e-6, 1e-9),
+        "total_curvature": (1e-6, 1e-9),
+        "score": (1e-6, 1e-9)
+    }
+}
+"""dict: 設定ごとの許容誤差の既定値.
+angleは全曲率を数値積分せずに求めるため、切り取り位置などが数値積分の誤差程度ずれます.
+"""
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+"""str: baselineのコミットで実行した結果を置くディレクトリ.
+input/に入力の軌道、axis/, result/, similar/, output/に各ステージの出力
+(:py:func:`build_paths` と同じ配置)、errors.jsonに実行中に発生した例外を置きます.
+"""
+
+def build_options(variant):
+    """基準の設定に変更を加えた設定を作ります
+
+    Args:
+        variant (dict): 基準の設定から変更する項目
+
+    Returns:
+        dict: 設定
+    """
+    unknown = set(variant) - set(REFERENCE)
+    if unknown:
+        raise ValueError("unknown options: " + ", ".join(sorted(unknown)))
+    return dict(REFERENCE, **variant)
+
+def build_paths(workdir, name, options):
+    """各ステージの入出力のファイルパスを作ります
+
+    Args:
+        workdir (str): 出力するディレクトリ
+        name (str): 軌道の名前
+        options (dict): 設定
+
+    Returns:
+        dict: ステージの出力の種類とファイルパス
+    """
+    return {
+        "axis": os.path.join(workdir, "axis", f"{name}.{options['archive_format']}"),
+        "bspline": os.path.join(workdir, "bspline", f"{name}.{options['sample_format']}"),
+        "result": os.path.join(workdir, "result", f"{name}.{options['archive_format']}"),
+        "similar": os.path.join(workdir, "similar", f"{name}.csv"),
+        "output": os.path.join(workdir, "output", f"{name}.csv")
+    }
+
+def run_pipeline(ipath, workdir, variant=None, quiet=True):
+    """設定を指定してパイプラインを実行します
+
+    Args:
+        ipath (str): 入力の軌道のファイルパス
+        workdir (str): 出力するディレクトリ
+        variant (dict): 基準の設定から変更する項目.Noneなら基準の設定で実行します.
+        quiet (bool): Trueなら各ステージの進捗表示を捨てます
+
+    Returns:
+        dict: 各ステージの出力のファイルパス
+    """
+    options = build_options(variant or {})
+    name = os.path.splitext(os.path.basename(ipath))[0]
+    paths = build_paths(workdir, name, options)
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(os.devnull, "w") as devnull, contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+            stack.enter_context(contextlib.redirect_stderr(devnull))
+        if options["async_write"]:
+            enable_async_writer()
+            stack.callback(disable_async_writer)
+        o = options
+        if o["batch_fit"]:
+            approximate_batch(
+                [ipath], [paths["axis"]], o["average_error"], o["lr"],
+                o["weighting"], o["momentum"], o["preprocess"]
+            )
+        else:
+            approximate(
+                ipath, paths["axis"], o["average_error"], o["lr"],
+                o["chunk_size"], o["overlap"], o["workers"],
+                o["weighting"], o["momentum"], o["coarse_factor"], o["preprocess"]
+            )
+        analyze_curvature(paths["axis"], paths["bspline"], paths["result"], o["curvature_method"])
+        similarity(paths["bspline"], paths["result"], paths["similar"])
+        value_calc(paths["similar"], paths["result"], paths["output"])
+    return paths
+
+def load_csv(path):
+    """数値のcsvを読み込みます.空のファイルの場合は空の配列を返します
+
+    Args:
+        path (str): ファイルパス
+
+    Returns:
+        array: (行数, 列数)の配列
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros((0, 0))
+    return pd.read_csv(path, header=None).values.astype(float)
+
+def as_float(v):
+    """Noneをnanとして数値に変換します
+
+    Args:
+        v (float or None): 値
+
+    Returns:
+        float: 値
+    """
+    return np.nan if v is None else float(v)
+
+def format_error(e):
+    """例外を比較に使う文字列にします
+
+    Args:
+        e (Exception): 例外
+
+    Returns:
+        str: "例外の型: メッセージ"
+    """
+    return f"{type(e).__name__}: {e}"
+
+def run_case(ipath, workdir, variant=None):
+    """パイプラインを実行し、比較に使う値を読み込みます
+
+    途中のステージで例外が発生した場合も、それまでに出力された値を読み込みます.
+
+    Args:
+        ipath (str): 入力の軌道のファイルパス
+        workdir (str): 出力するディレクトリ
+        variant (dict): 基準の設定から変更する項目.Noneなら基準の設定で実行します.
+
+    Returns:
+        dict, str or None: 比較に使う値(:py:func:`load_outputs` の返り値), 発生した例外.
+            例外が発生しなければNone.
+    """
+    name = os.path.splitext(os.path.basename(ipath))[0]
+    paths = build_paths(workdir, name, build_options(variant or {}))
+    try:
+        run_pipeline(ipath, workdir, variant)
+    except Exception as e:
+        error = format_error(e)
+    else:
+        error = None
+    return load_outputs(paths), error
+
+def golden_inputs():
+    """baselineの結果がある入力の軌道を返します
+
+    Returns:
+        List[str]: 入力の軌道のファイルパス
+    """
+    d = os.path.join(GOLDEN_DIR, "input")
+    return [os.path.join(d, f) for f in sorted(os.listdir(d)) if f.endswith(".csv")]
+
+def load_golden(name):
+    """baselineの結果を読み込みます
+
+    Args:
+        name (str): 軌道の名前
+
+    Returns:
+        dict, str or None: 比較に使う値, baselineで発生した例外
+    """
+    with open(os.path.join(GOLDEN_DIR, "errors.json"), encoding="utf-8") as f:
+        errors = json.load(f)
+    return load_outputs(build_paths(GOLDEN_DIR, name, REFERENCE)), errors.get(name)
+
+def load_outputs(paths):
+    """比較に使う値を読み込みます
+
+    存在しないファイル(例外で途中までしか実行されなかった場合)の値は含めません.
+
+    Args:
+        paths (dict): run_pipelineが返した各ステージの出力のファイルパス
+
+    Returns:
+        dict: 値の種類と値.曲線ごとの値は"curves"にリストとして入ります.
+    """
+    outputs = {}
+    if os.path.exists(paths["axis"]):
+        axis = load_archive(paths["axis"])
+        outputs["control_point"] = np.asarray(axis["bspline"]["control_point"], dtype=float)
+        outputs["knot_vector"] = np.asarray(axis["bspline"]["knot_vector"], dtype=float)
+    if os.path.exists(paths["result"]):
+        analysis = load_archive(paths["result"])["total_curvature_analysis"]
+        curves = []
+        for curve in analysis["curves"]:
+            arcs = curve["arcs"]
+            curves.append({
+                "is_valid": bool(curve["is_valid"]),
+                "inflection": np.asarray(curve["ts"], dtype=float),
+                "trim": np.array([arc["trim_ts"] for arc in arcs], dtype=float),
+                "length": np.array(
+                    [[arc["original_length"], arc["trim_length"]] for arc in arcs], dtype=float
+                ),
+                "total_curvature": np.array(
+                    [[arc["total_curvature"], as_float(arc["trimed_total_curvature"])] for arc in arcs]
+                )
+            })
+        outputs["inflection_points"] = np.asarray(analysis["inflection_points"], dtype=float)
+        outputs["curves"] = curves
+    if os.path.exists(paths["similar"]):
+        outputs["similarity"] = load_csv(paths["similar"])
+    if os.path.exists(paths["output"]):
+        outputs["score"] = load_csv(paths["output"])
+    return outputs
@@ -22,6 +22,8 @@ jsonファイルが出力されます．
 "knot_vector"はノットベクトルです.
 "parameter"は近似の際に用いた軌道のパラメータであり、
 このパラメータが示すのは、i番目の元軌道位置がi番目のパラメータと同じ値を持つ媒介変数です.
+前処理(:py:mod:`remove_unmoved_points`)を行った場合、"original_trajectory"は残したフレームだけになり、
+"preprocess"の"kept_index"に、残したフレームが入力ファイルの何行目かが格納されます.
 
 入力例
 
@@ -101,12 +103,14 @@ Options:
     --filter=<f>  filter for input files
 
 """
-import os
 import sys
 import csv
-import json
 import numpy as np
 from .bspline.lspia import Lspia
+from .bspline.multiresolution import coarse_to_fine_fit
+from .remove_unmoved_points import preprocess as preprocess_trajectory
+from .common.archive import save_archive, dumps_json
+from .common.profiler import count
 
 def load(inputfile):
     """Generate trajectory from input file.
@@ -129,66 +133,230 @@ def load(inputfile):
                 pass
     return np.array(traj)
 
-def write_result(original, param, p, knots, ctrls, output):
-    """Write approximation result as json file.
-
-    近似前後の軌道データを基もとに、jsonファイルとしてデータを出力してくれます.
+def build_result(original, param, p, knots, ctrls, kept_index=None, n_frames=None):
+    """近似結果を、出力するjsonと同じ形式の辞書にします
 
     Args:
         original (vector array): Original trajectory
+        param (array): parameter of b-spline
         p (int): degree of b-spline
         knots (array): knot vector
         ctrls (vector array): control points
-        output (string): output file path
+        kept_index (array): 前処理で残したフレームが入力の何行目か.Noneなら前処理無し.
+        n_frames (int): 前処理前のフレーム数
+
+    Returns:
+        dict: 近似結果
     """
     dst_obj = {
-        "original_trajectory": original.tolist(),
+        "original_trajectory": np.asarray(original),
         "bspline": {
             "desc": "LSPIAにより軌道をBスプラインに近似した結果",
-            "parameter": param.tolist(),
+            "parameter": np.asarray(param),
             "degree": p,
-            "knot_vector": knots.tolist(),
-            "control_point": ctrls.tolist()
+            "knot_vector": np.asarray(knots),
+            "control_point": np.asarray(ctrls)
         }
     }
-    dst_string = json.dumps(dst_obj, sort_keys=True, indent=4)
+    if kept_index is not None:
+        dst_obj["preprocess"] = {
+            "desc": "前処理で残したフレームが入力ファイルの何行目か",
+            "kept_index": np.asarray(kept_index),
+            "n_frames": n_frames
+        }
+    return dst_obj
+
+def write_result(original, param, p, knots, ctrls, output, kept_index=None, n_frames=None):
+    """Write approximation result as json file.
+
+    近似前後の軌道データを基もとに、jsonファイルとしてデータを出力してくれます.
+    出力ファイルの拡張子が.npzの場合は、配列をバイナリで格納した形式で出力します
+    (:py:mod:`common.archive` を参照).
+
+    Args:
+        original (vector array): Original trajectory
+        param (array): parameter of b-spline
+        p (int): degree of b-spline
+        knots (array): knot vector
+        ctrls (vector array): control points
+        output (string): output file path
+        kept_index (array): 前処理で残したフレームが入力の何行目か.Noneなら前処理無し.
+        n_frames (int): 前処理前のフレーム数
+    """
+    dst_obj = build_result(original, param, p, knots, ctrls, kept_index, n_frames)
     if output is None:
         with sys.stdout as f:
-            f.write(dst_string)
+            f.write(dumps_json(dst_obj))
     else:
-        if not os.path.exists(os.path.dirname(output)):
-            os.makedirs(os.path.dirname(output))
-        with open(output, "w") as f:
-            f.write(dst_string)
+        save_archive(output, dst_obj)
 
-def approximate(ipath, apath, average_error, lr):
-    """Approximate a trajectory.
+def fit_trajectory(traj, average_error, lr,
+                   chunk_size=None, overlap=200, workers=1,
+                   weighting="global", momentum=0.0, coarse_factor=None,
+                   preprocess=None):
+    """軌道を近似します(ファイルは読み書きしません)
 
-    B-spline関数の次数、入力ファイルパス、出力ファイルパスをもとに近似を行います.
-    もしlogフラグがTrueにセットされていた場合、logファイルも同時に出力します.
+    引数は :py:func:`approximate` と同じです.
 
     Args:
-        p (int): degree of b-spline
-        ipath (string): input file path
-        opath (string or None): outpur file path
-            if this arg is None, output to sys.stdout
-        log (bool): If you need .log file, set True
+        traj (vector array): (frame, x, y, z)の列
+        average_error (float): 元軌道1点あたりの誤差
+        lr (float): 収束判定に使う、average_errorに対する比
+        chunk_size (int or None): 窓一つあたりの点の数.Noneなら分割しません.
+        overlap (int): 隣り合う窓で重なる点の数
+        workers (int): 窓の近似に使うプロセス数
+        weighting (str): LSPIAの更新の重み."global"もしくは"diagonal"
+        momentum (float): LSPIAの更新に加える慣性項の係数.0なら通常のLSPIA
+        coarse_factor (int or None): 粗い近似で何点に1点残すか.Noneなら粗い近似を行いません.
+        preprocess (dict or None): 前処理のオプション(min_move, outlier_k, chord_tol).
+            Noneなら前処理を行いません.
+
+    Returns:
+        dict: 近似結果(:py:func:`build_result` の返り値)
     """
-    traj = load(ipath)
-    obj_err = average_error * len(traj)
-    lspia = Lspia(
-        traj[:, 1:],
-        4,
-        obj_err,
-        average_error * lr
-    )
-    for p, knots, ctrls, err in lspia.run():
-        pass
-    write_result(
+    n_frames, kept_index = len(traj), None
+    if preprocess is not None:
+        traj, kept_index = preprocess_trajectory(traj, **preprocess)
+    if chunk_size is not None and len(traj) > chunk_size:
+        # scipy.interpolateのimportは窓に分割する場合だけ行います
+        from .bspline.chunk import chunked_fit
+        param, knots, ctrls = chunked_fit(
+            traj[:, 1:],
+            4,
+            average_error,
+            average_error * lr,
+            chunk_size,
+            overlap,
+            workers,
+            weighting,
+            momentum
+        )
+        return build_result(traj, param, 4, knots, ctrls, kept_index, n_frames)
+    if coarse_factor is not None and coarse_factor > 1:
+        lspia = coarse_to_fine_fit(
+            traj[:, 1:],
+            4,
+            average_error,
+            average_error * lr,
+            coarse_factor,
+            weighting,
+            momentum
+        )
+    else:
+        obj_err = average_error * len(traj)
+        lspia = Lspia(
+            traj[:, 1:],
+            4,
+            obj_err,
+            average_error * lr,
+            weighting,
+            momentum
+        )
+        for p, knots, ctrls, err in lspia.run():
+            pass
+    print(f'\niterations -> {lspia.iterations}, knot insertions -> {lspia.knot_insertions}', end='')
+    count("lspia_iterations", lspia.iterations)
+    count("knot_insertions", lspia.knot_insertions)
+    return build_result(
         traj,
         lspia.get_params(),
         lspia.get_degree(),
         lspia.get_knot_vector(),
         lspia.get_control_points(),
-        apath
+        kept_index,
+        n_frames
     )
+
+def approximate(ipath, apath, average_error, lr,
+                chunk_size=None, overlap=200, workers=1,
+                weighting="global", momentum=0.0, coarse_factor=None,
+                preprocess=None):
+    """Approximate a trajectory.
+
+    B-spline関数の次数、入力ファイルパス、出力ファイルパスをもとに近似を行います.
+    chunk_sizeが設定されていて軌道がそれより長い場合、
+    軌道を重なりを持つ窓に分割して近似し、1本のB-spline曲線に繋ぎ合わせます
+    (:py:mod:`bspline.chunk` を参照).出力されるjsonの形式は変わりません.
+    coarse_factorが設定されている場合、間引いた軌道で近似してから
+    元の軌道で近似を仕上げます(:py:mod:`bspline.multiresolution` を参照).
+    preprocessが設定されている場合、近似の前に静止したフレームなどを取り除きます
+    (:py:mod:`remove_unmoved_points` を参照).
+
+    Args:
+        ipath (string): input file path
+        apath (string or None): outpur file path
+            if this arg is None, output to sys.stdout
+        average_error (float): 元軌道1点あたりの誤差
+        lr (float): 収束判定に使う、average_errorに対する比
+        chunk_size (int or None): 窓一つあたりの点の数.Noneなら分割しません.
+        overlap (int): 隣り合う窓で重なる点の数
+        workers (int): 窓の近似に使うプロセス数
+        weighting (str): LSPIAの更新の重み."global"もしくは"diagonal"
+        momentum (float): LSPIAの更新に加える慣性項の係数.0なら通常のLSPIA
+        coarse_factor (int or None): 粗い近似で何点に1点残すか.Noneなら粗い近似を行いません.
+        preprocess (dict or None): 前処理のオプション(min_move, outlier_k, chord_tol).
+            Noneなら前処理を行いません.
+    """
+    dst_obj = fit_trajectory(
+        load(ipath), average_error, lr, chunk_size, overlap, workers,
+        weighting, momentum, coarse_factor, preprocess
+    )
+    if apath is None:
+        with sys.stdout as f:
+            f.write(dumps_json(dst_obj))
+    else:
+        save_archive(apath, dst_obj)
+
+def approximate_batch(ipaths, apaths, average_error, lr,
+                      weighting="global", momentum=0.0, preprocess=None):
+    """Approximate many trajectories at once.
+
+    短い軌道が大量にある場合に、全ての軌道のLSPIAを
+    1つのバッチとしてまとめて進めます(:py:mod:`bspline.batch` を参照).
+    出力されるjsonはapproximateと同じ形式です.
+
+    Args:
+        ipaths (List[string]): input file paths
+        apaths (List[string]): output file paths
+        average_error (float): 元軌道1点あたりの誤差
+        lr (float): 収束判定に使う、average_errorに対する比
+        weighting (str): LSPIAの更新の重み."global"もしくは"diagonal"
+        momentum (float): LSPIAの更新に加える慣性項の係数.0なら通常のLSPIA
+        preprocess (dict or None): 前処理のオプション.Noneなら前処理を行いません.
+    """
+    # scipy.sparseのimportはバッチで近似する場合だけ行います
+    from .bspline.batch import BatchLspia
+    trajs = [load(ipath) for ipath in ipaths]
+    n_frames = [len(traj) for traj in trajs]
+    kept_indices = [None] * len(trajs)
+    if preprocess is not None:
+        trajs, kept_indices = zip(*[
+            preprocess_trajectory(traj, **preprocess) for traj in trajs
+        ])
+    lspias = [
+        Lspia(
+            traj[:, 1:],
+            4,
+            average_error * len(traj),
+            average_error * lr,
+            weighting,
+            momentum
+        ) for traj in trajs
+    ]
+    batch = BatchLspia(lspias)
+    for _ in batch.run():
+        pass
+    print(f'\niterations -> {batch.iterations}', end='')
+    count("lspia_iterations", sum(lspia.iterations for lspia in lspias))
+    count("knot_insertions", sum(lspia.knot_insertions for lspia in lspias))
+    for traj, lspia, apath, kept_index, n in zip(trajs, lspias, apaths, kept_indices, n_frames):
+        write_result(
+            traj,
+            lspia.get_params(),
+            lspia.get_degree(),
+            lspia.get_knot_vector(),
+            lspia.get_control_points(),
+            apath,
+            kept_index,
+            n
+        )
@@ -27,6 +27,7 @@ http://www.cs.mtu.edu/~shene/COURSES/cs3621/NOTES/spline/B-spline/bspline-curve-
 このページが詳しいです.
 """
 import numpy as np
+from ..common.profiler import count
 
 class BSpline(object):
     """BSpline curve class.
@@ -63,6 +64,7 @@ class BSpline(object):
         self.h = h
         self.knots = knots
         self.ctrls = ctrls
+        self._diff = None
 
     def __call__(self, u):
         """__call__ function.
@@ -75,6 +77,7 @@ class BSpline(object):
         Returns:
             array: 3-D positon
         """
+        count("spline_evaluations")
         return value(self.h, self.knots, self.ctrls, u)
 
     def value(self, u):
@@ -91,6 +94,20 @@ class BSpline(object):
         """
         return self.__call__(u)
 
+    def values(self, us):
+        """calcurate b-spline curve postions at once
+
+        複数の媒介変数に対する曲線の位置をまとめて計算します.
+
+        Args:
+            us (array): 媒介変数の列
+
+        Returns:
+            vector array: (媒介変数の数, 次元数)の位置
+        """
+        count("spline_evaluations", len(us))
+        return values(self.h, self.knots, self.ctrls, us)
+
     def diff(self):
         """Create derivative function.
 
@@ -101,10 +118,13 @@ class BSpline(object):
         詳細については、Derivatives of a B-spline Curve
         (http://www.cs.mtu.edu/~shene/COURSES/cs3621/NOTES/spline/B-spline/bspline-derv.html)
         を参考にしてください。
+        一度計算した微分は保持しておき、次からはそれを返します.
 
         Returns:
             BSpline: new b-spline function
         """
+        if self._diff is not None:
+            return self._diff
         diff_ctrls = np.zeros((self.ctrls.shape[0] - 1, self.ctrls.shape[1]))
         for i in range(len(self.ctrls) - 1):
             diff_ctrls[i] = (
@@ -114,11 +134,12 @@ class BSpline(object):
             )
         diff_knots = self.knots[1:-1]
         diff_h = self.h - 1
-        return BSpline(
+        self._diff = BSpline(
             diff_h,
             diff_knots,
             diff_ctrls
         )
+        return self._diff
 
     def __str__(self):
         """__str__ function
@@ -199,3 +220,69 @@ def value(p, knots, ctrls, u):
     for i in range(ctrls.shape[0]):
         result += coef[i] * ctrls[i]
     return result
+
+def find_knots_indices(knots, us):
+    """ノットベクトルにおける各uの位置をまとめて探索します
+
+    :py:func:`find_knots_index` をベクトル化したものです.
+    ただし、u == knots[-1]の場合は最後の長さを持つ区間のindexを返します.
+
+    Args:
+        knots (array): ノットベクトル
+        us (array): 曲線の進行度の列
+
+    Returns:
+        array: 各uが属するノット区間のindex
+    """
+    last = np.searchsorted(knots, knots[-1], side="left") - 1
+    return np.minimum(np.searchsorted(knots, us, side="right") - 1, last)
+
+def basis_functions(p, knots, us):
+    """各uで0にならないp+1個のBスプライン係数をまとめて計算します
+
+    The NURBS Book の Algorithm A2.2 を媒介変数の列についてベクトル化したものです.
+    uがノット区間kに属するとき、結果のj列目は制御点k-p+jへの重みです.
+
+    Args:
+        p (int): スプライン関数の次数
+        knots (array): ノット列
+        us (array): 曲線の進行度の列
+
+    Returns:
+        array, matrix: 各uが属するノット区間のindex, (uの数, p+1)の係数
+    """
+    us = np.asarray(us, dtype=float)
+    k = find_knots_indices(knots, us)
+    N = np.zeros((us.shape[0], p + 1))
+    N[:, 0] = 1.0
+    left = np.zeros((us.shape[0], p + 1))
+    right = np.zeros((us.shape[0], p + 1))
+    for j in range(1, p + 1):
+        left[:, j] = us - knots[k + 1 - j]
+        right[:, j] = knots[k + j] - us
+        saved = np.zeros(us.shape[0])
+        for r in range(j):
+            temp = N[:, r] / (right[:, r + 1] + left[:, j - r])
+            N[:, r] = saved + right[:, r + 1] * temp
+            saved = left[:, j - r] * temp
+        N[:, j] = saved
+    N[(us < knots[0]) | (knots[-1] < us)] = 0.0
+    return k, N
+
+def values(p, knots, ctrls, us):
+    """複数の媒介変数に対するBスプライン曲線の位置をまとめて計算します
+
+    Args:
+        p (int): 曲線の次数
+        knots (array): ノットベクトル
+        ctrls (vector array): 制御点
+        us (array): 曲線の進行度の列
+
+    Returns:
+        vector array: (uの数, 次元数)の曲線の位置
+    """
+    k, N = basis_functions(p, knots, us)
+    result = np.zeros((N.shape[0], ctrls.shape[1]))
+    for j in range(p + 1):
+        result += N[:, j, None] * ctrls[k - p + j]
+    return result
@@ -0,0 +1,121 @@
+"""複数の軌道のLSPIAをまとめて進めるモジュール
+
+短い軌道が大量にある場合、:py:class:`bspline.lspia.Lspia` を1つずつ回すと、
+1回の更新あたりの計算は小さいのにpythonの処理が毎回かかってしまいます.
+ここでは、複数の軌道のLSPIAを1つのバッチとして扱い、
+全ての軌道の誤差と制御点の移動量を、
+Collocation matrixを対角に並べたブロック行列との積として一度に計算します.
+
+各軌道の収束判定やノットの挿入はLspiaと同じように軌道ごとに行い、
+収束した軌道はその場でバッチから抜けます.
+ノットの挿入や軌道が抜けたことでブロックの構造が変わった場合だけ、
+ブロック行列を作り直します.
+
+Examples:
+    >>> lspias = [Lspia(Q, p, th, thstep) for Q in Qs]
+    >>> batch = BatchLspia(lspias)
+    >>> for n_active in batch.run():
+    >>>     pass
+    >>> lspias[0].get_control_points()  # 結果は各Lspiaに入っています
+"""
+import numpy as np
+import scipy.sparse as sp
+
+class BatchLspia(object):
+    """複数のLspiaをまとめて更新するクラス
+
+    Attributes:
+        lspias (List[Lspia]): まとめて更新するLspia
+        active (List[int]): まだ収束していないLspiaのindex
+        iterations (int): バッチ全体を更新した回数
+
+    Args:
+        lspias (List[Lspia]): まとめて更新するLspia.
+            初期化が済んでいる(まだrunしていない)必要があります.
+    """
+    def __init__(self, lspias):
+        self.lspias = lspias
+        self.active = list(range(len(lspias)))
+        self.iterations = 0
+        self.rebuild()
+
+    def rebuild(self):
+        """バッチに残っているLspiaから、ブロック行列などを作り直します"""
+        ls = [self.lspias[i] for i in self.active]
+        if len(ls) == 0:
+            return
+        self.A = sp.block_diag([l.A for l in ls], format="csr")
+        self.AT = self.A.T.tocsr()
+        self.Q = np.vstack([l.Q for l in ls])
+        self.P = np.vstack([l.P for l in ls])
+        self.myu = np.hstack([
+            np.broadcast_to(l.myu, (l.P.shape[0],)) for l in ls
+        ])[:, None]
+        self.q_offsets = np.cumsum([0] + [l.Q.shape[0] for l in ls])
+        self.p_offsets = np.cumsum([0] + [l.P.shape[0] for l in ls])
+        for j, l in enumerate(ls):
+            l.P = self.P[self.p_offsets[j]:self.p_offsets[j + 1]]
+
+    def update(self):
+        """バッチに残っている全てのLspiaを1回ずつ更新します
+
+        Returns:
+            int: 更新後にバッチに残っているLspiaの数
+        """
+        changed = False
+        for i in list(self.active):
+            l = self.lspias[i]
+            if np.all(np.abs(l.delta_diff) <= l.thstep):
+                if l.n >= l.nmax:
+                    self.active.remove(i)
+                else:
+                    l.P = l.P.copy()
+                    l.add_ctrls()
+                changed = True
+        if changed:
+            self.rebuild()
+        if len(self.active) == 0:
+            return 0
+
+        delta = self.Q - self.A.dot(self.P)
+        norms = np.linalg.norm(delta, axis=1)
+        errs = np.add.reduceat(norms, self.q_offsets[:-1])
+        moves = self.myu * self.AT.dot(delta)
+
+        finished = []
+        for j, i in enumerate(self.active):
+            l = self.lspias[i]
+            qs = slice(self.q_offsets[j], self.q_offsets[j + 1])
+            ps = slice(self.p_offsets[j], self.p_offsets[j + 1])
+            restore = None
+            if l.momentum > 0.0:
+                restore, d, errs[j], moves[ps] = l.momentum_step(delta[qs], errs[j], moves[ps])
+            if restore is None:
+                l.delta_diff = delta[qs] - l.delta
+                l.delta = delta[qs]
+                l.delta_norm = norms[qs]
+            else:
+                # 誤差が増えたので、制御点を戻して通常の更新をやり直します(Lspia.updateと同じ)
+                l.P[...] = restore
+                l.delta_diff = np.ones(l.Q.shape) * np.inf
+                l.delta = d
+                l.delta_norm = np.linalg.norm(d, axis=1)
+            l.iterations += 1
+            if errs[j] <= l.th:
+                finished.append(i)
+        self.P += moves
+        self.iterations += 1
+        if len(finished) > 0:
+            for i in finished:
+                self.lspias[i].P = self.lspias[i].P.copy()
+                self.active.remove(i)
+            self.rebuild()
+        return len(self.active)
+
+    def run(self):
+        """全てのLspiaが収束するまでupdateを繰り返します"""
+        n_active = len(self.active)
+        while n_active > 0:
+            n_active = self.update()
+            print(f'\rprogress -> {n_active} / {len(self.lspias)} active', end='')
+            yield n_active
@@ -0,0 +1,186 @@
+"""長い軌道を窓に分割して近似し、1本のB-spline曲線に繋ぎ合わせる手法を提供します.
+
+:py:class:`bspline.lspia.Lspia` は軌道全体を1本のB-spline曲線として近似するため、
+軌道が長くなるほど計算量とメモリが増え、一部の悪い区間が全体の収束を止めてしまいます.
+このモジュールでは、軌道を重なりを持つ窓に分割し、窓ごとに独立して近似を行い
+(必要ならプロセス並列で)、最後に1本のB-spline曲線に繋ぎ合わせます.
+
+繋ぎ合わせは次のように行います.
+
+* 各窓のノットを全体の媒介変数に写して並べ、1本のノットベクトルとします.
+  重なり部分には両方の窓のノットを残します.
+  ただし、間に点が1つも無いほど近いノットは1つにまとめます.
+* 重なり部分では窓の近似結果を線形に重み付けして混ぜ合わせ、
+  それを全体のノットベクトルで最小二乗近似して制御点とします.
+* 繋ぎ合わせた曲線の誤差が全体の基準(一点あたりの誤差×点の数)を超える場合は、
+  それを初期値として全体の点列でLSPIAを再開し、
+  必要ならノットを挿入して基準を満たすまで近似を続けます.
+
+内部ノットは全て単純ノットなので、繋ぎ合わせた曲線は :math:`C^{p-1}` 連続になります.
+
+窓の軌道に対するパラメータは弦長から作られるため、
+全体のパラメータを窓の範囲で正規化したものと一致します.
+そのため、窓のノットは線形な写像で全体のパラメータに戻すことができます.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.interpolate as si
+from .base import BSpline
+from .lspia import Lspia, create_ordered_point_param
+from ..common.profiler import count
+
+def split_windows(m, chunk_size, overlap):
+    """点列を重なりを持つ窓に分割します
+
+    最後の窓が短くなりすぎる場合は、一つ前の窓を末尾まで伸ばします.
+
+    Args:
+        m (int): 点の数
+        chunk_size (int): 窓一つあたりの点の数
+        overlap (int): 隣り合う窓で重なる点の数
+
+    Returns:
+        List[Tuple[int, int]]: 各窓の(始点index, 終点index+1)
+
+    Raises:
+        ValueError: overlapがchunk_size以上の場合に発生
+    """
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    if m <= chunk_size:
+        return [(0, m)]
+    step = chunk_size - overlap
+    windows = []
+    begin = 0
+    while begin + chunk_size < m:
+        windows.append((begin, begin + chunk_size))
+        begin += step
+    if m - begin < chunk_size // 2:
+        windows[-1] = (windows[-1][0], m)
+    else:
+        windows.append((begin, m))
+    return windows
+
+def fit_window(Q, p, th, thstep, weighting="global", momentum=0.0):
+    """一つの窓をLSPIAで近似します
+
+    プロセス並列で呼び出せるように、モジュールレベルの関数にしています.
+
+    Args:
+        Q (vector array): 窓内の点列
+        p (int): Bスプラインの次数
+        th (float): 近似結果の評価に使う誤差の合計
+        thstep (float): 更新の収束判定につかう
+        weighting (str): "global"もしくは"diagonal"
+        momentum (float): 慣性項の係数
+
+    Returns:
+        array, vector array: ノットベクトル, 制御点
+    """
+    lspia = Lspia(Q, p, th, thstep, weighting, momentum)
+    for _ in lspia.run():
+        pass
+    count("lspia_iterations", lspia.iterations)
+    count("knot_insertions", lspia.knot_insertions)
+    return lspia.get_knot_vector(), lspia.get_control_points()
+
+def calc_blend_weights(t, windows):
+    """重なり部分で窓の近似結果を混ぜ合わせる重みを計算します
+
+    重なり部分では、前の窓の重みが1から0へ、後の窓の重みが0から1へ
+    媒介変数に対して線形に変化します.
+
+    Args:
+        t (array): 全体の媒介変数
+        windows (List[Tuple[int, int]]): 各窓の範囲
+
+    Returns:
+        matrix: (窓の数, 点の数)の重み.各列の和は1になります.
+    """
+    W = np.zeros((len(windows), t.shape[0]))
+    for w, (b, e) in enumerate(windows):
+        W[w, b:e] = 1.0
+        if w > 0:
+            pe = windows[w - 1][1]
+            ramp = (t[b:pe] - t[b]) / (t[pe - 1] - t[b])
+            W[w, b:pe] = ramp
+            W[w - 1, b:pe] = 1.0 - ramp
+    return W
+
+def stitch_knots(t, windows, knotss, p):
+    """各窓のノットを全体の媒介変数に写し、1本のノットベクトルにします
+
+    重なり部分には両方の窓のノットを残します.
+    最小二乗近似が解けるように、間に点が無いノットは1つにまとめます.
+
+    Args:
+        t (array): 全体の媒介変数
+        windows (List[Tuple[int, int]]): 各窓の範囲
+        knotss (List[array]): 各窓のノットベクトル
+        p (int): Bスプラインの次数
+
+    Returns:
+        array: 全体のノットベクトル
+    """
+    inner = [
+        t[b] + knots[p + 1:-(p + 1)] * (t[e - 1] - t[b])
+        for (b, e), knots in zip(windows, knotss)
+    ]
+    inner = np.unique(np.hstack(inner))
+    inner = inner[(0.0 < inner) & (inner < 1.0)]
+    # 同じ点の間に入るノットは最初のものだけを残します
+    _, first = np.unique(np.searchsorted(t, inner), return_index=True)
+    inner = inner[first]
+    return np.hstack((np.zeros(p + 1), inner, np.ones(p + 1)))
+
+def chunked_fit(Q, p, average_error, thstep, chunk_size, overlap, workers=1,
+                weighting="global", momentum=0.0):
+    """軌道を窓に分割して近似し、1本のB-spline曲線として繋ぎ合わせます
+
+    繋ぎ合わせた曲線が全体の誤差の基準を満たさない場合は、
+    それを初期値として全体の点列でLSPIAを行います.
+
+    Args:
+        Q (vector array): 近似したい点
+        p (int): Bスプラインの次数
+        average_error (float): 一点あたりの誤差
+        thstep (float): 更新の収束判定につかう
+        chunk_size (int): 窓一つあたりの点の数
+        overlap (int): 隣り合う窓で重なる点の数
+        workers (int): 窓の近似に使うプロセス数.1なら逐次実行します.
+        weighting (str): LSPIAの更新の重み."global"もしくは"diagonal"
+        momentum (float): LSPIAの更新に加える慣性項の係数
+
+    Returns:
+        array, array, vector array: 媒介変数, ノットベクトル, 制御点
+    """
+    t = create_ordered_point_param(Q)
+    windows = split_windows(Q.shape[0], chunk_size, overlap)
+    args = [
+        (Q[b:e], p, average_error * (e - b), thstep, weighting, momentum)
+        for b, e in windows
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            fits = list(ex.map(fit_window, *zip(*args)))
+    else:
+        fits = [fit_window(*a) for a in args]
+
+    W = calc_blend_weights(t, windows)
+    blended = np.zeros(Q.shape)
+    for w, ((b, e), (knots, P)) in enumerate(zip(windows, fits)):
+        u = (t[b:e] - t[b]) / (t[e - 1] - t[b])
+        blended[b:e] += W[w, b:e, np.newaxis] * BSpline(p, knots, P).values(u)
+
+    knots = stitch_knots(t, windows, [f[0] for f in fits], p)
+    ctrls = si.make_lsq_spline(t, blended, knots, k=p).c
+    th = average_error * Q.shape[0]
+    err = np.sum(np.linalg.norm(Q - BSpline(p, knots, ctrls).values(t), axis=1))
+    if err > th:
+        lspia = Lspia(Q, p, th, thstep, weighting, momentum, knots=knots, P=ctrls, t=t)
+        for _ in lspia.run():
+            pass
+        count("lspia_iterations", lspia.iterations)
+        count("knot_insertions", lspia.knot_insertions)
+        knots, ctrls = lspia.get_knot_vector(), lspia.get_control_points()
+    return t, knots, ctrls
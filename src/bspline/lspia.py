@@ -1,5 +1,5 @@
 import numpy as np
-from .base import value, coefficients
+from .base import values, basis_functions
 
 class Lspia(object):
     """LSPIA を実装したクラス
@@ -25,12 +25,28 @@ class Lspia(object):
         delta (vector array): 各点での誤差
         delta_norm (array): 各点ごとの誤差の大きさ
         delta_diff (vector array): 各点での誤差の変化
+        weighting (str): 更新の重みの種類.
+            "global"なら全制御点で共通の :math:`\mu` 、
+            "diagonal"なら制御点ごとの重み(weighted PIA)を使います
+        momentum (float): 更新に加える慣性項の係数.0なら通常のLSPIA
+        velocity (vector array): 前回の移動量(慣性項に使う)
+        prev_err (float): 前回の誤差の合計
+        prev_P (vector array): 前回の更新前の制御点(誤差が増えた場合に戻します)
+        prev_delta (vector array): prev_Pでの各点の誤差
+        use_momentum (bool): 慣性項を使うか.誤差が増えた場合、次にノットを挿入するまでFalseになります
+        iterations (int): 制御点を更新した回数
+        knot_insertions (int): ノットを挿入した回数
 
     Args:
         Q (vector array): 近似したい点
         p (int): Bスプラインの次数
         th (float): 近似結果の評価に使う。平均して、一点あたりこれ以下の誤差なら終了
         thstep (float): 更新の収束判定につかう
+        weighting (str): "global"もしくは"diagonal"
+        momentum (float): 慣性項の係数(0以上1未満)
+        knots (array): 初期のノットベクトル.Noneならp+1個の制御点から始めます
+        P (vector array): 初期の制御点.knotsと合わせて与えます
+        t (array): 各点のパラメータ.Noneなら弧長から作ります
 
     Examples:
         Q, p, thなどの必要なパラメータは予め決定しておいてください
@@ -49,8 +65,20 @@ class Lspia(object):
         >>> bsp = BSpline(p, knot, P)
 
         ここで、bspは近似後の軌道を表します.
+
+        収束を速めたい場合は、制御点ごとの重みや慣性項を使うことができます.
+
+        >>> lspia = Lspia(Q, p, th, thstep, weighting="diagonal", momentum=0.5)
+        >>> for p, knot, P, err in lspia.run():
+        >>>     pass
+        >>> print(lspia.iterations)  # 通常のLSPIAとの比較に
+
+        慣性項を加えた更新で誤差が増えた場合は、その更新を捨てて制御点を更新前の値に戻し、
+        そこから通常の更新をやり直します.次にノットを挿入するまでは慣性項を使わないため、
+        最悪の場合でも通常のLSPIAと同じ更新になり、収束は保証されます.
     """
-    def __init__(self, Q, p, th, thstep):
+    def __init__(self, Q, p, th, thstep, weighting="global", momentum=0.0,
+                 knots=None, P=None, t=None):
         """コンストラクタ
 
         Args:
@@ -58,18 +86,38 @@ class Lspia(object):
             p (int): Bスプラインの次数
             th (float): 近似結果の評価に使う。平均して、一点あたりこれ以下の誤差なら終了
             thstep (float): 更新の収束判定につかう
+            weighting (str): "global"もしくは"diagonal"
+            momentum (float): 慣性項の係数(0以上1未満)
+            knots (array): 初期のノットベクトル(粗い近似からの再開などに使います)
+            P (vector array): 初期の制御点
+            t (array): 各点のパラメータ(間引いた点列を元の点列のパラメータで近似する場合などに使います)
         """
+        if weighting not in ("global", "diagonal"):
+            raise ValueError("Invalid weighting")
+        if not 0.0 <= momentum < 1.0:
+            raise ValueError("Invalid momentum")
         self.Q = Q
         self.p = p
         self.n = p
         self.th = th
         self.thstep = thstep
+        self.weighting = weighting
+        self.momentum = momentum
+        self.iterations = 0
+        self.knot_insertions = 0
         self.nmax = self.Q.shape[0] - 1
         if self.nmax <= p:
             raise ValueError("Invalid p")
-        self.t = create_ordered_point_param(self.Q)
-        self.knots = create_knot_vector(self.n, self.p, self.t)
-        self.P = create_default_P(self.Q, self.n)
+        self.t = create_ordered_point_param(self.Q) if t is None else np.asarray(t, dtype=float)
+        if knots is None:
+            self.knots = create_knot_vector(self.n, self.p, self.t)
+            self.P = create_default_P(self.Q, self.n)
+        else:
+            self.n = P.shape[0] - 1
+            if self.n > self.nmax or knots.shape[0] != self.n + p + 2:
+                raise ValueError("Invalid initial knots")
+            self.knots = knots
+            self.P = P
         self.m = self.Q.shape[0] - 1
         self.A = create_collocation_matrix(
             self.t,
@@ -78,7 +126,7 @@ class Lspia(object):
             self.n,
             self.p
         )
-        self.myu = create_appropriate_weight(self.A)
+        self.myu = self.create_weight()
         self.delta = 0
         self.delta_norm = 0
         self.delta_diff = 0
@@ -99,20 +147,77 @@ class Lspia(object):
             else:
                 self.add_ctrls()
         delta = calc_delta(self.Q, self.p, self.knots, self.P, self.t)
-        self.delta_diff = delta - self.delta
+        err = np.sum(np.linalg.norm(delta, axis=1))
+        moves = calc_move(self.myu, self.A, delta)
+        restore = None
+        if self.momentum > 0.0:
+            restore, delta, err, moves = self.momentum_step(delta, err, moves)
+        if restore is None:
+            self.delta_diff = delta - self.delta
+        else:
+            self.P = restore
+            self.delta_diff = np.ones(self.Q.shape) * np.inf
         self.delta = delta
         self.delta_norm = np.linalg.norm(self.delta, axis=1)
-        moves = calc_move(self.myu, self.A, self.delta)
         self.P = self.P + moves
-        err = np.sum(self.delta_norm)
+        self.iterations += 1
         cont = err > self.th
         return cont, self.p, self.knots, self.P, err
 
+    def momentum_step(self, delta, err, moves):
+        """慣性項を使う場合の、今回の更新に使う誤差と移動量を決めます
+
+        前回の(慣性項を加えた)更新で誤差が増えていた場合は、その更新を捨てて
+        前回の更新前の制御点から通常の更新をやり直します.
+        その後は次にノットを挿入するまで慣性項を使いません.
+
+        Args:
+            delta (vector array): 現在の制御点での各点の誤差
+            err (float): 現在の制御点での誤差の合計
+            moves (vector array): deltaから計算した通常の移動量
+
+        Returns:
+            vector array or None, vector array, float, vector array:
+                戻すべき制御点(戻さない場合はNone)、更新に使う各点の誤差、その合計、移動量
+        """
+        if self.use_momentum and err > self.prev_err:
+            self.use_momentum = False
+            self.velocity = np.zeros(self.P.shape)
+            return (
+                self.prev_P,
+                self.prev_delta,
+                self.prev_err,
+                calc_move(self.myu, self.A, self.prev_delta)
+            )
+        if self.use_momentum:
+            moves = moves + self.momentum * self.velocity
+            self.velocity = moves
+            self.prev_P = self.P.copy()
+            self.prev_delta = delta
+            self.prev_err = err
+        return None, delta, err, moves
+
+    def create_weight(self):
+        """更新に用いる重みを計算します
+
+        Returns:
+            float or array: weightingが"global"なら :math:`\mu` 、
+                "diagonal"なら制御点ごとの重み
+        """
+        if self.weighting == "diagonal":
+            return create_diagonal_weight(self.A)
+        return create_appropriate_weight(self.A)
+
     def delta2inf(self):
         """delta系列をinfに飛ばします"""
         self.delta = np.ones(self.Q.shape) * np.inf
         self.delta_norm = np.linalg.norm(self.delta, axis=1)
         self.delta_diff = np.ones(self.P.shape) * np.inf
+        self.velocity = np.zeros(self.P.shape)
+        self.prev_err = np.inf
+        self.prev_P = None
+        self.prev_delta = None
+        self.use_momentum = True
 
     def add_ctrls(self):
         """制御点を追加します"""
@@ -130,7 +235,8 @@ class Lspia(object):
             self.n,
             self.p
         )
-        self.myu = create_appropriate_weight(self.A)
+        self.myu = self.create_weight()
+        self.knot_insertions += 1
         self.delta2inf()
 
     def run(self):
@@ -186,29 +292,20 @@ def calc_delta(Q, p, knots, P, t):
     Returns:
         vector: delta
     """
-    delta = np.zeros(Q.shape)
-    for i in range(t.shape[0]):
-        delta[i] = Q[i] - value(p, knots, P, t[i])
-    return delta
+    return Q - values(p, knots, P, t)
 
 def calc_move(myu, A, delta):
     """制御点の移動量を計算します
 
     Args:
-        myu (float): 移動幅
+        myu (float or array): 移動幅.制御点ごとの重みの場合は(制御点の数,)の配列
         A (matrix): 係数行列
         delta (vector array): 移動量
 
     Returns:
         vector array: 移動量
     """
-    n = A.shape[1]
-    m = A.shape[0]
-    moves = np.zeros((n, delta.shape[1]))
-    for i in range(n):
-        for j in range(m):
-            moves[i] += myu * A[j, i] * delta[j]
-    return moves
+    return np.reshape(myu, (-1, 1)) * np.dot(A.T, delta)
 
 
 def create_ordered_point_param(Q):
@@ -224,9 +321,8 @@ def create_ordered_point_param(Q):
             t[len(Q)-1] = 1.0,
             となるように生成されます.
     """
-    param = np.zeros(Q.shape[0])
-    for i in range(Q.shape[0] - 1):
-        param[i+1] = param[i] + np.sqrt(np.sum((Q[i] - Q[i+1]) ** 2))
+    dist = np.sqrt(np.sum((Q[:-1] - Q[1:]) ** 2, axis=1))
+    param = np.hstack(([0.0], np.cumsum(dist)))
     return param / param[-1]
 
 
@@ -275,8 +371,7 @@ def create_default_P(Q, n):
     """
     m = Q.shape[0] - 1
     result = np.zeros((n + 1, Q.shape[1]))
-    for i in range(n):
-        result[i] = Q[int(np.round(m / n * i))]
+    result[:n] = Q[np.round(m / n * np.arange(n)).astype(int)]
     return result
 
 def create_collocation_matrix(t, knots, m, n, p):
@@ -291,8 +386,10 @@ def create_collocation_matrix(t, knots, m, n, p):
         p (int): Bスプライン関数の次数
     """
     result = np.zeros((t.shape[0], n + 1))
-    for i in range(t.shape[0]):
-        result[i] = coefficients(n, p, knots, t[i])
+    k, N = basis_functions(p, knots, t)
+    rows = np.arange(t.shape[0])
+    for j in range(p + 1):
+        result[rows, k - p + j] = N[:, j]
     return result
 
 def create_appropriate_weight(A):
@@ -311,6 +408,25 @@ def create_appropriate_weight(A):
         a[i] = np.sum(t[i])
     return 2.0 / np.max(a)
 
+def create_diagonal_weight(A, omega=1.9):
+    """Collocation matrixから、制御点ごとの重みを計算します(weighted PIA)
+
+    :math:`A^TA` の各行の和を :math:`d_i` としたとき、重みを :math:`\omega / d_i` とします.
+    :math:`A^TA` の要素は全て非負なので、 :math:`D^{-1}A^TA` の固有値は(0, 1]に収まり、
+    :math:`0 < \omega < 2` であれば収束が保証されます.
+    台の小さい基底関数に対応する制御点ほど大きく動くため、
+    全体で一つの :math:`\mu` を使うよりも速く収束します.
+
+    Args:
+        A (matrix): Collocation matrix
+        omega (float): 緩和係数(0 < omega < 2)
+
+    Returns:
+        array: 制御点ごとの重み
+    """
+    a = np.sum(np.dot(A.T, A), axis=1)
+    return omega / np.maximum(a, np.finfo(float).tiny)
+
 def add_ctrls(p, knots, P, t, err):
     t_j, t_bar = calcurate_inserted_knot(t, knots, err)
     knots, P = insert_knot(knots, t_bar, t_j, p, P)
@@ -326,11 +442,15 @@ def calculate_knot_interval_error(t, knot, error):
         error (array): 現在の近似元点と近似結果との差(差のノルムの配列)
 
     Returns:
-        array: ノット間ごとの誤差, ノット間に格納された曲線のパラメータのテーブル.
+        array, matrix: ノット間ごとの誤差, ノット間に格納された曲線のパラメータの範囲.
+            範囲はノット間ごとの(始まりのindex, 終わりのindex+1)で、
+            knot[j] <= t[i] <= knot[j+1]を満たすiがその範囲に入ります.
     """
-    ts = [[ i for i, te in enumerate(t) if k1 <= te <= k2
-      ] for k1, k2 in zip(knot, knot[1:])]
-    return np.array([np.sum(error[te]) for te in ts]), ts
+    lo = np.searchsorted(t, knot[:-1], side="left")
+    hi = np.searchsorted(t, knot[1:], side="right")
+    hi = np.maximum(lo, hi)
+    cs = np.hstack(([0.0], np.cumsum(error)))
+    return cs[hi] - cs[lo], np.stack((lo, hi), axis=1)
 
 def calcurate_inserted_knot(t, knots, delta_norm):
     """誤差量と曲線のパラメータ、ノットベクトルから、
@@ -351,19 +471,20 @@ def calcurate_inserted_knot(t, knots, delta_norm):
     t_j = None
     t_bar = None
     j = np.argmax(d)
-    if len(ts[j]) == 2:
+    lo, hi = ts[j]
+    if hi - lo == 2:
         t_j = j
         t_bar = (t[j] + t[j + 1]) / 2.0
-    elif len(ts[j]) > 2:
+    elif hi - lo > 2:
         d_max = d[j]
-        for t_i in ts[j]:
-            begin_indices = np.arange(ts[j][0], t_i + 1, 1)
-            end_indices = np.arange(t_i, ts[j][-1] + 1, 1)
-            if ((np.sum(delta_norm[begin_indices]) >= d_max / 2.0) and
-                    (np.sum(delta_norm[end_indices]) >= d_max / 2.0)):
-                t_j = j
-                t_bar = (t[t_i] + t[t_i + 1]) / 2.0
-                break
+        cs = np.cumsum(delta_norm[lo:hi])
+        begin_sums = cs
+        end_sums = cs[-1] - np.hstack(([0.0], cs[:-1]))
+        ok = (begin_sums >= d_max / 2.0) & (end_sums >= d_max / 2.0)
+        if np.any(ok):
+            t_i = lo + int(np.argmax(ok))
+            t_j = j
+            t_bar = (t[t_i] + t[t_i + 1]) / 2.0
     return t_j, t_bar
 
 def insert_knot(knots, t, k, p, P):
@@ -384,15 +505,11 @@ def insert_knot(knots, t, k, p, P):
             knotsはtが挿入されたノットベクトル.
             Pは形状が変更されないように調整された制御点.
     """
-    result_P = []
-    for i in range(len(P) + 1):
-        if i <= k - p:
-            result_P.append(P[i])
-        elif k - p + 1 <= i <= k:
-            ai = (t - knots[i]) / (knots[i+p] - knots[i])
-            result_P.append(
-                (1.0 - ai) * P[i - 1] + ai * P[i]
-            )
-        elif k + 1 <= i:
-            result_P.append(P[i-1])
-    return np.insert(knots, k + 1, t), np.array(result_P)
+    i = np.arange(k - p + 1, k + 1)
+    ai = ((t - knots[i]) / (knots[i + p] - knots[i]))[:, None]
+    result_P = np.vstack((
+        P[:k - p + 1],
+        (1.0 - ai) * P[i - 1] + ai * P[i],
+        P[k:]
+    ))
+    return np.insert(knots, k + 1, t), result_P
@@ -0,0 +1,99 @@
+"""粗い近似から細かい近似へと段階的にLSPIAを行う手法を提供します.
+
+:py:class:`bspline.lspia.Lspia` はp+1個の制御点から始めて、
+全ての点を使って制御点の更新とノットの挿入を繰り返します.
+点の数が多い場合、ノットがある程度揃うまでの反復も全ての点に対して行われるため、
+時間がかかります.
+
+ここでは、まず点列を間引いた粗い点列でLSPIAを行ってノットを増やし、
+その結果のノットベクトルと制御点を初期値として、
+元の点列でのLSPIAを再開します.
+元の点列での反復は、粗い近似からの仕上げだけで済むようになります.
+
+粗い点列のパラメータには、間引いた点列から作り直した弧長ではなく、
+元の点列の弧長パラメータのうち残した点(kept_index)のものを使います.
+そのため粗い近似のノットは元の点列のパラメータ上の値になり、
+そのまま元の点列での近似の初期値にできます.
+最後は元の点列に対して同じ誤差の基準で収束させるため、
+出力されるデータの意味は変わりません.
+"""
+import numpy as np
+from .lspia import Lspia, create_ordered_point_param
+
+def decimate_index(m, factor):
+    """点列を間引くときに残す点のindexを返します
+
+    端点は必ず残します.
+
+    Args:
+        m (int): 点の数
+        factor (int): 何点に1点残すか
+
+    Returns:
+        array: 残す点のindex
+    """
+    idx = np.arange(0, m, factor)
+    if idx[-1] != m - 1:
+        idx = np.append(idx, m - 1)
+    return idx
+
+def decimate(Q, factor):
+    """点列を間引きます
+
+    端点は必ず残します.
+
+    Args:
+        Q (vector array): 点列
+        factor (int): 何点に1点残すか
+
+    Returns:
+        vector array: 間引いた点列
+    """
+    return Q[decimate_index(Q.shape[0], factor)]
+
+def coarse_to_fine_fit(Q, p, average_error, thstep, factor,
+                       weighting="global", momentum=0.0):
+    """粗い点列で近似してから、元の点列で近似を仕上げます
+
+    Args:
+        Q (vector array): 近似したい点
+        p (int): Bスプラインの次数
+        average_error (float): 一点あたりの誤差
+        thstep (float): 更新の収束判定につかう
+        factor (int): 粗い点列を作るときに何点に1点残すか
+        weighting (str): LSPIAの更新の重み."global"もしくは"diagonal"
+        momentum (float): LSPIAの更新に加える慣性項の係数
+
+    Returns:
+        Lspia: 元の点列で収束したLspia
+    """
+    kept_index = decimate_index(Q.shape[0], factor)
+    coarse = Q[kept_index]
+    if coarse.shape[0] - 1 > p:
+        lspia = Lspia(
+            coarse,
+            p,
+            average_error * coarse.shape[0],
+            thstep,
+            weighting,
+            momentum,
+            t=create_ordered_point_param(Q)[kept_index]
+        )
+        for _ in lspia.run():
+            pass
+        knots, P = lspia.get_knot_vector(), lspia.get_control_points()
+    else:
+        knots, P = None, None
+    lspia = Lspia(
+        Q,
+        p,
+        average_error * Q.shape[0],
+        thstep,
+        weighting,
+        momentum,
+        knots,
+        P
+    )
+    for _ in lspia.run():
+        pass
+    return lspia
@@ -0,0 +1,143 @@
+"""B-spline関数をノット区間ごとの多項式として表現します.
+
+B-spline関数は、各ノット区間 :math:`[u_k, u_{k+1})` の中ではp次の多項式です.
+近似が終わった後の曲線は変化しないため、区間ごとの多項式の係数を一度だけ計算しておけば、
+評価のたびにCox-de Boorの漸化式を計算し直す必要はありません.
+
+ここでは、区間の左端 :math:`u_k` まわりのべき基底
+
+.. math::
+
+    \\vec{C}(u) = \\sum_{j=0}^{p}\\vec{c}_{k,j}(u - u_k)^j,
+    \\quad
+    \\vec{c}_{k,j} = \\frac{1}{j!}\\vec{C}^{(j)}(u_k)
+
+で表現します.係数は各区間の左端における微分値から計算します.
+評価は区間の探索とHornerの方法だけで済み、複数の媒介変数についてまとめて計算できます.
+
+Examples:
+    >>> pp = compile_bspline(bsp)  # bspはBSpline
+    >>> pp(0.5)  # bsp(0.5)と同じ値
+    >>> pp.values(np.linspace(0.0, 1.0, 100))
+    >>> pp.diff()  # 微分もPiecewisePolynomialになります
+"""
+import math
+import bisect
+import numpy as np
+from ..common.profiler import count
+
+class PiecewisePolynomial(object):
+    """ノット区間ごとの多項式で表された曲線
+
+    BSplineと同じように、関数として呼び出したり、微分したりできます.
+    定義域の外では0を返します.
+
+    Attributes:
+        h (int): 多項式の次数
+        breaks (array): 区間の境界(重複の無いノット)
+        coefs (array): (区間の数, h+1, 次元数)の係数.
+            coefs[k, j]は区間kにおける(u - breaks[k])^jの係数です.
+
+    Args:
+        breaks (array): 区間の境界
+        coefs (array): (区間の数, h+1, 次元数)の係数
+    """
+    def __init__(self, breaks, coefs):
+        self.breaks = breaks
+        self.coefs = coefs
+        self.h = coefs.shape[1] - 1
+        self._breaks = breaks.tolist()
+        self._diff = None
+
+    def _span(self, us):
+        k = np.searchsorted(self.breaks, us, side="right") - 1
+        return np.clip(k, 0, self.coefs.shape[0] - 1)
+
+    def __call__(self, u):
+        """__call__ function.
+
+        Args:
+            u (float): this function return C(u)
+
+        Returns:
+            array: position
+        """
+        count("spline_evaluations")
+        if u < self._breaks[0] or self._breaks[-1] < u:
+            return np.zeros(self.coefs.shape[2])
+        k = min(bisect.bisect_right(self._breaks, u) - 1, self.coefs.shape[0] - 1)
+        s = u - self._breaks[k]
+        c = self.coefs[k]
+        result = c[self.h]
+        for j in range(self.h - 1, -1, -1):
+            result = result * s + c[j]
+        return result
+
+    def value(self, u):
+        """calcurate curve postion
+
+        Args:
+            u (float): 媒介変数
+
+        Returns:
+            array: position
+        """
+        return self(u)
+
+    def values(self, us):
+        """calcurate curve postions at once
+
+        Args:
+            us (array): 媒介変数の列
+
+        Returns:
+            vector array: (媒介変数の数, 次元数)の位置
+        """
+        us = np.asarray(us, dtype=float)
+        count("spline_evaluations", us.shape[0])
+        k = self._span(us)
+        s = (us - self.breaks[k])[:, None]
+        c = self.coefs[k]
+        result = c[:, self.h]
+        for j in range(self.h - 1, -1, -1):
+            result = result * s + c[:, j]
+        result[(us < self.breaks[0]) | (self.breaks[-1] < us)] = 0.0
+        return result
+
+    def diff(self):
+        """Create derivative function.
+
+        各区間の多項式を微分した関数を返します.
+        一度計算した微分は保持しておき、次からはそれを返します.
+
+        Returns:
+            PiecewisePolynomial: 微分した関数
+        """
+        if self._diff is None:
+            if self.h == 0:
+                coefs = np.zeros_like(self.coefs)
+            else:
+                j = np.arange(1, self.h + 1, dtype=float)
+                coefs = self.coefs[:, 1:] * j[None, :, None]
+            self._diff = PiecewisePolynomial(self.breaks, coefs)
+        return self._diff
+
+def compile_bspline(bsp):
+    """B-spline関数をノット区間ごとの多項式に変換します
+
+    Args:
+        bsp (bspline.base.BSpline): B-spline関数
+
+    Returns:
+        PiecewisePolynomial: bspと同じ曲線を表す多項式
+    """
+    h = bsp.h
+    breaks = np.unique(bsp.knots[h:bsp.knots.shape[0] - h])
+    starts = breaks[:-1]
+    coefs = np.zeros((starts.shape[0], h + 1, bsp.ctrls.shape[1]))
+    d = bsp
+    for j in range(h + 1):
+        coefs[:, j] = d.values(starts) / math.factorial(j)
+        if j < h:
+            d = d.diff()
+    return PiecewisePolynomial(breaks, coefs)
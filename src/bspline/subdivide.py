@@ -73,16 +73,11 @@ def subdivide_ctrl_points(bspline, t, k=None):
     p = bspline.h
     s = 0
     net = create_deboor_net(bspline, t, k)
-    Ps = ([], [])
-    for i in range(k - p + 1):
-        Ps[0].append(P[i])
-    for i in range(1, p - s + 1):
-        Ps[0].append(net[i][k - p + i])
-    for i in range(p - s, 0, -1):
-        Ps[1].append(net[i][k - s])
-    for i in range(k - s, len(P)):
-        Ps[1].append(P[i])
-    return np.array(Ps[0]), np.array(Ps[1])
+    r = np.arange(1, p - s + 1)
+    return (
+        np.vstack((P[:k - p + 1], net[r, r])),
+        np.vstack((net[r[::-1], p - s], P[k - s:]))
+    )
 
 def create_deboor_net(bspline, t, k):
     """deBoorのアルゴリズムで表される、netを計算します.
@@ -93,25 +88,22 @@ def create_deboor_net(bspline, t, k):
         k (int): 挿入位置をあらわすindex
 
     Returns:
-        dict: ネットを表すPの二次元dictionary
+        array: ネットを表す(h+1, p+1, 次元数)の配列.
+            net[r, i - (k - p)]がr段目のi番目の点です(i < k - p + rの部分は使いません).
     """
     p = bspline.h
     h = bspline.h
     u = bspline.knots
     P = bspline.ctrls
     s = 0
-    Ps = {0: {}}
-    for i in range(k - p, k - s + 1):
-        Ps[0][i] = P[i]
-    a = {}
+    net = np.zeros((h + 1, p + 1, P.shape[1]))
+    net[0, :p - s + 1] = P[k - p:k - s + 1]
     for r in range(1, h + 1):
-        a[r] = {}
-        Ps[r] = {}
-        for i in range(k - p + r, k - s + 1):
-            a[r][i] = (t - u[i]) / (u[i + p - r + 1] - u[i])
-            Ps[r][i] = ((1.0 - a[r][i]) * Ps[r - 1][i - 1] +
-                        a[r][i] * Ps[r - 1][i])
-    return Ps
+        i = np.arange(k - p + r, k - s + 1)
+        a = ((t - u[i]) / (u[i + p - r + 1] - u[i]))[:, None]
+        j = i - (k - p)
+        net[r, j] = (1.0 - a) * net[r - 1, j - 1] + a * net[r - 1, j]
+    return net
 
 def calc_divide_index(knots, t):
     """軌道分割における，どの部分にノットを差し込むかを表すindexを計算します.
@@ -127,3 +119,54 @@ def calc_divide_index(knots, t):
         if knots[i] <= t < knots[i + 1]:
             return i
     return -1
+
+def calc_divide_indices(knots, ts):
+    """calc_divide_indexを複数の媒介変数についてまとめて計算します.
+
+    Args:
+        knots (float array): ノットベクトル
+        ts (array): 分割位置を表す媒介変数の列
+
+    Returns:
+        array: 挿入位置のindex(knots[0] <= t < knots[-1]でない場合は-1)
+    """
+    ts = np.asarray(ts, dtype=float)
+    k = np.searchsorted(knots, ts, side="right") - 1
+    k[(ts < knots[0]) | (knots[-1] <= ts)] = -1
+    return k
+
+def subdivide_many(bspline, ts):
+    """軌道の関数を指定された全ての位置でまとめて分割します.
+
+    変曲点など、複数の位置で軌道を一度に切り分けるために使います.
+    各区間は、元の軌道のうちその区間に影響する制御点とノットだけを切り出してから
+    両端で分割するため、それぞれ小さな独立したBSplineになります
+    (ワーカープロセスに渡す場合も安く済みます).
+
+    Args:
+        bspline (BSpline): BSpline軌道を表すオブジェクト
+        ts (array): 分割位置の媒介変数.定義域の内側にある必要があります.
+
+    Returns:
+        List[BSpline]: 分割された len(ts)+1 個の軌道.
+            i番目は[ts[i-1], ts[i]]の範囲を表します(両端は定義域の端).
+    """
+    p = bspline.h
+    u = bspline.knots
+    P = bspline.ctrls
+    ts = np.sort(np.asarray(ts, dtype=float))
+    ks = calc_divide_indices(u, ts)
+    if np.any(ks < 0):
+        raise ValueError("ts must be inside the domain of bspline")
+    last = np.searchsorted(u, u[-1], side="left") - 1
+    bounds = np.r_[p, ks, last]
+    dsts = []
+    for i in range(len(ts) + 1):
+        ka, kb = bounds[i], bounds[i + 1]
+        local = BSpline(p, u[ka - p:kb + p + 2], P[ka - p:kb + 1])
+        if i > 0:
+            local = subdivide(local, ts[i - 1])[1]
+        if i < len(ts):
+            local = subdivide(local, ts[i])[0]
+        dsts.append(local)
+    return dsts
@@ -0,0 +1,241 @@
+"""archive以下に保存される近似結果や解析結果の読み書きを担当するモジュール
+
+保存形式はファイルの拡張子で決まります.
+
+* ``.json``: これまで通りの整形されたjsonファイル(``indent=4``, ``sort_keys=True``).
+* ``.npz``: 数値配列をバイナリで格納し、それ以外のメタデータを
+  jsonの文字列として別に格納したnumpyのアーカイブ.
+
+npz形式では、辞書を再帰的にたどり、数値の配列として表せる値
+("original_trajectory"、"parameter"、"control_point"など)を
+``bspline/control_point`` のようなキーでバイナリとして保存します.
+リストの中に辞書が入っているような値("curves"など)はメタデータ側に入ります.
+読み込むと元と同じ入れ子の辞書が返りますが、配列はnumpy.ndarrayになっています.
+
+archive/bspline以下の投影した軌道のサンプル点も、拡張子で形式が決まります.
+
+* ``.csv``: これまで通りの1行1フレームのcsvファイル.
+* ``.npy``: (フレーム数, 次元数)のfloat64配列を固定長で並べたバイナリ.
+  読み込み時はメモリマップするため、必要なフレームの範囲だけを
+  コピー無しで切り出すことができます.
+
+書き込みは全て :py:mod:`common.writer` を通して行われるため、
+一時ファイルからのrenameで書き込まれ、バックグラウンドでの書き込みにも対応します.
+
+Examples:
+    >>> save_archive('archive/axis/01.npz', obj)
+    >>> obj = load_archive('archive/axis/01.npz')
+    >>> convert_archive('archive/result/01.npz', 'archive/result/01.json')
+    >>> save_samples('archive/bspline/01.npy', samples)
+    >>> pos = load_samples('archive/bspline/01.npy', 100, 400)
+"""
+import os
+import csv
+import json
+import numpy as np
+from .writer import write_file, wait_for
+
+META_KEY = "__meta__"
+"""str: npz内でメタデータを格納するキー
+"""
+
+def get_extension(path, supported=(".json", ".npz")):
+    """ファイルパスからアーカイブの形式を返します
+
+    Args:
+        path (str): ファイルパス
+        supported (Tuple[str]): 対応している拡張子
+
+    Returns:
+        str: "json"もしくは"npz"など、拡張子から.を除いたもの
+
+    Raises:
+        ValueError: 対応していない拡張子の場合に発生
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in supported:
+        raise ValueError("unsupported archive format: " + str(path))
+    return ext[1:]
+
+def to_serializable(o):
+    """json.dumpで扱えない値を変換します
+
+    Args:
+        o (object): numpyの配列もしくはスカラー
+
+    Returns:
+        object: pythonのリストもしくはスカラー
+    """
+    if isinstance(o, (np.ndarray, np.generic)):
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def dumps_json(obj):
+    """jsonの文字列に変換します
+
+    Args:
+        obj (dict): 保存するデータ
+
+    Returns:
+        str: jsonの文字列
+    """
+    return json.dumps(obj, sort_keys=True, indent=4, default=to_serializable)
+
+def as_numeric_array(value):
+    """値が数値の配列として表せる場合に、配列に変換します
+
+    Args:
+        value (object): 変換する値
+
+    Returns:
+        array or None: 数値の配列.表せない場合はNone.
+    """
+    if isinstance(value, np.ndarray):
+        return value if value.dtype.kind in "biuf" else None
+    if not isinstance(value, (list, tuple)) or len(value) == 0:
+        return None
+    try:
+        arr = np.asarray(value)
+    except ValueError:
+        return None
+    if arr.dtype.kind not in "biuf":
+        return None
+    return arr
+
+def split_arrays(obj, prefix=""):
+    """辞書をメタデータと数値配列に分けます
+
+    Args:
+        obj (dict): 分ける辞書
+        prefix (str): 配列のキーの接頭辞
+
+    Returns:
+        dict, dict: メタデータ, キーと配列の辞書
+    """
+    meta = {}
+    arrays = {}
+    for k, v in obj.items():
+        key = prefix + k
+        if isinstance(v, dict):
+            meta[k], sub = split_arrays(v, key + "/")
+            arrays.update(sub)
+            continue
+        arr = as_numeric_array(v)
+        if arr is None:
+            meta[k] = v
+        else:
+            arrays[key] = arr
+    return meta, arrays
+
+def merge_arrays(meta, arrays):
+    """split_arraysで分けたメタデータと配列を元の辞書に戻します
+
+    Args:
+        meta (dict): メタデータ
+        arrays (dict): キーと配列の辞書
+
+    Returns:
+        dict: 元の辞書
+    """
+    for key, arr in arrays.items():
+        d = meta
+        names = key.split("/")
+        for name in names[:-1]:
+            d = d.setdefault(name, {})
+        d[names[-1]] = arr
+    return meta
+
+def save_archive(path, obj):
+    """データを保存します
+
+    保存先のディレクトリが無い場合は作成します.
+    objは後でバックグラウンドで書き込まれる場合があるため、
+    呼び出し後に変更しないでください.
+
+    Args:
+        path (str): 保存先のファイルパス.拡張子で形式が決まります.
+        obj (dict): 保存するデータ
+    """
+    fmt = get_extension(path)
+    if fmt == "json":
+        def write(dst):
+            with open(dst, "w", encoding="utf-8") as f:
+                f.write(dumps_json(obj))
+    else:
+        def write(dst):
+            meta, arrays = split_arrays(obj)
+            arrays[META_KEY] = np.array(json.dumps(meta, default=to_serializable))
+            with open(dst, "wb") as f:
+                np.savez(f, **arrays)
+    write_file(path, write)
+
+def load_archive(path):
+    """データを読み込みます
+
+    Args:
+        path (str): ファイルパス.拡張子で形式が決まります.
+
+    Returns:
+        dict: 読み込んだデータ
+    """
+    fmt = get_extension(path)
+    wait_for(path)
+    if fmt == "json":
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    with np.load(path, allow_pickle=False) as f:
+        arrays = {k: f[k] for k in f.files}
+    meta = json.loads(str(arrays.pop(META_KEY)))
+    return merge_arrays(meta, arrays)
+
+def convert_archive(src, dst):
+    """アーカイブの形式を変換します
+
+    npzで保存した結果をjsonとして書き出したい場合などに使います.
+
+    Args:
+        src (str): 変換元のファイルパス
+        dst (str): 変換先のファイルパス
+    """
+    save_archive(dst, load_archive(src))
+
+def save_samples(path, samples):
+    """投影した軌道のサンプル点を保存します
+
+    Args:
+        path (str): 保存先のファイルパス.拡張子(.csvもしくは.npy)で形式が決まります.
+        samples (vector array): (フレーム数, 次元数)のサンプル点
+    """
+    fmt = get_extension(path, (".csv", ".npy"))
+    samples = np.array(samples, dtype=np.float64)
+    if fmt == "csv":
+        def write(dst):
+            with open(dst, "w", encoding="utf-8") as f:
+                csv.writer(f).writerows(samples)
+    else:
+        def write(dst):
+            with open(dst, "wb") as f:
+                np.save(f, samples)
+    write_file(path, write)
+
+def load_samples(path, begin=None, end=None):
+    """投影した軌道のサンプル点を読み込みます
+
+    .npyの場合はメモリマップした配列を切り出して返すため、
+    実際にファイルから読み込まれるのは参照したフレームだけです.
+
+    Args:
+        path (str): ファイルパス.拡張子(.csvもしくは.npy)で形式が決まります.
+        begin (int): 切り出すフレームの始まり.Noneなら先頭から.
+        end (int): 切り出すフレームの終わり(このフレームは含みません).Noneなら末尾まで.
+
+    Returns:
+        vector array: (フレーム数, 次元数)のサンプル点
+    """
+    fmt = get_extension(path, (".csv", ".npy"))
+    wait_for(path)
+    if fmt == "csv":
+        samples = np.loadtxt(path, delimiter=",", ndmin=2)
+    else:
+        samples = np.load(path, mmap_mode="r")
+    return samples[begin:end]
@@ -4,6 +4,10 @@ jsonを読み取って対応させるだけなので，ややこしいことは
 
 ip1, t1, t2, t3, ip2 = parameter_get(json_data, i)
 t_n_ip1, t_n_s, t_n_c, t_n_f, t_n_ip2 = frame_get(json_data, 0, ip1, t1, t2, t3, ip2)
+
+近似の前にフレームを取り除いた場合、frame_getが返すのは残したフレームの番号です
+(サンプル点はこの番号で参照します)．入力ファイルの何行目かに戻すときは
+original_frame_get(json_data, t_n_s, t_n_f) のようにします．
 '''
 
 import numpy as np
@@ -50,3 +54,10 @@ def frame_get(json_data, t_n, ip1, t1, t2, t3, ip2):
         t_n = t_n + 1
     return t_n_ip1, t_n_s, t_n_c, t_n_f, t_n_ip2
 
+#残したフレームの番号を入力ファイルの行番号に戻す関数(前処理をしていなければそのまま返す)
+def original_frame_get(json_data, *t_ns):
+    if 'preprocess' not in json_data:
+        return t_ns if len(t_ns) > 1 else t_ns[0]
+    kept_index = np.asarray(json_data['preprocess']['kept_index'])
+    frames = tuple(int(kept_index[min(t_n, len(kept_index) - 1)]) for t_n in t_ns)
+    return frames if len(frames) > 1 else frames[0]
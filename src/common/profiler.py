@@ -0,0 +1,176 @@
+"""パイプラインの処理時間や呼び出し回数を記録するためのモジュール
+
+:py:func:`enable_profiler` を呼ぶと記録が有効になります.無効な場合は、
+:py:func:`count` や :py:func:`stage` は何もしません.
+
+* :py:func:`stage` で囲んだ区間ごとに、経過時間(wall)、CPU時間、
+  区間内のメモリ使用量(RSS)の最大値を記録します.
+  メモリ使用量はバックグラウンドのスレッドで一定間隔ごとに調べます.
+* :py:func:`count` で、B-spline曲線の評価(spline_evaluations)、数値積分(integrations)、
+  求根(root_finds, 変曲点の探索で符号の変化を調べた区間の数はroot_brackets)、
+  LSPIAの反復(lspia_iterations)、ノットの挿入(knot_insertions)などの回数を数えます.
+  プロセス並列で実行された処理の回数は数えられません.
+  カウンタはその時点で実行中のステージごとに記録されます.
+  実行中のステージはスレッド(コンテキスト)ごとに保持されるため、
+  バックグラウンドの書き込みスレッドなど、ステージの外で数えた回数は
+  どのステージにも入りません(全体の"counters"には入ります).
+* :py:func:`save_profile` で、記録した内容をjsonとして書き出し、記録を空にします.
+
+Examples:
+    >>> enable_profiler()
+    >>> with stage('approximate'):
+    >>>     approximate(...)
+    >>> save_profile('archive/profile/01.json')
+"""
+import os
+import time
+import threading
+import contextvars
+import resource
+from contextlib import contextmanager
+from .archive import dumps_json
+from .writer import write_file
+
+SAMPLING_INTERVAL = 0.01
+"""float: メモリ使用量を調べる間隔(秒)
+"""
+
+_profile = None
+_lock = threading.Lock()
+_current_stage = contextvars.ContextVar("current_stage", default=None)
+
+def get_rss():
+    """現在のメモリ使用量を返します
+
+    /proc/self/statmが読めない環境では、これまでの最大値を返します.
+
+    Returns:
+        int: メモリ使用量(byte)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class MemorySampler(object):
+    """バックグラウンドのスレッドでメモリ使用量の最大値を調べます
+
+    Attributes:
+        peak (int): これまでに調べたメモリ使用量の最大値(byte)
+
+    Args:
+        interval (float): 調べる間隔(秒)
+    """
+    def __init__(self, interval=SAMPLING_INTERVAL):
+        self.interval = interval
+        self.peak = get_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, get_rss())
+
+    def stop(self):
+        """調べるのをやめ、最大値を返します
+
+        Returns:
+            int: メモリ使用量の最大値(byte)
+        """
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, get_rss())
+        return self.peak
+
+def enable_profiler():
+    """記録を有効にします"""
+    global _profile
+    if _profile is None:
+        _profile = {"stages": {}, "counters": {}}
+
+def disable_profiler():
+    """記録を無効にし、記録した内容を捨てます"""
+    global _profile
+    _profile = None
+
+def is_enabled():
+    """記録が有効かどうかを返します
+
+    Returns:
+        bool: 有効ならTrue
+    """
+    return _profile is not None
+
+def count(name, n=1):
+    """回数を数えます
+
+    実行中のステージがあればそのステージのカウンタに加えます.
+
+    Args:
+        name (str): カウンタの名前
+        n (int): 加える数
+    """
+    profile = _profile
+    if profile is None:
+        return
+    with _lock:
+        counters = profile["counters"].setdefault(_current_stage.get(), {})
+        counters[name] = counters.get(name, 0) + n
+
+@contextmanager
+def stage(name):
+    """囲んだ区間をステージとして記録します
+
+    Args:
+        name (str): ステージの名前
+    """
+    if _profile is None:
+        yield
+        return
+    token = _current_stage.set(name)
+    sampler = MemorySampler()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        result = {
+            "wall": time.perf_counter() - wall,
+            "cpu": time.process_time() - cpu,
+            "peak_rss": sampler.stop()
+        }
+        _current_stage.reset(token)
+        if _profile is not None:
+            with _lock:
+                _profile["stages"][name] = result
+
+def save_profile(path):
+    """記録した内容をjsonとして書き出し、記録を空にします
+
+    記録が無効な場合は何もしません.
+
+    Args:
+        path (str): 書き込み先のファイルパス
+    """
+    if _profile is None:
+        return
+    with _lock:
+        stages = _profile["stages"]
+        counters = _profile["counters"]
+        _profile["stages"], _profile["counters"] = {}, {}
+    obj = {
+        "stages": {
+            name: dict(s, counters=counters.get(name, {}))
+            for name, s in stages.items()
+        },
+        "counters": {}
+    }
+    for c in counters.values():
+        for k, v in c.items():
+            obj["counters"][k] = obj["counters"].get(k, 0) + v
+    text = dumps_json(obj)
+    def write(dst):
+        with open(dst, "w", encoding="utf-8") as f:
+            f.write(text)
+    write_file(path, write)
@@ -7,6 +7,30 @@ Note:
     と完全にかぶってる.完全に自分のミス.
 """
 import numpy as np
+from ..bspline.base import BSpline
+
+def project_bspline(bsp, axis):
+    """投影を制御点に畳み込んだB-spline関数を作ります.
+
+    投影は線形なので、B-spline関数の投影は
+    制御点を投影したB-spline関数と一致します.
+
+    .. math::
+
+        A \\cdot \\sum_{i=0}^{n}B_{i, p}(t)\\vec{P}_i =
+        \\sum_{i=0}^{n}B_{i, p}(t)(A \\cdot \\vec{P}_i)
+
+    :py:class:`ProjectedBSpline` と違い、戻り値はただのBSplineなので、
+    評価のたびに行列積を計算する必要がなく、微分もBSplineのまま行えます.
+
+    Args:
+        bsp(bspline.base.BSpline): 投影される軌道
+        axis(matrix): 投影面を表す行列
+
+    Returns:
+        bspline.base.BSpline: 投影された軌道
+    """
+    return BSpline(bsp.h, bsp.knots, np.dot(bsp.ctrls, np.asarray(axis).T))
 
 class ProjectedBSpline:
     """ 面に投影されたBSpline軌道を表す
@@ -66,6 +90,20 @@ class ProjectedBSpline:
         """
         return np.dot(self.axis, self.bsp.value(t))
 
+    def values(self, ts):
+        """Call projected trajectory at once.
+
+        元の関数の位置をまとめて計算し、投影の行列積を一度だけ行います.
+        元の関数がvalues関数を実装している必要があります.
+
+        Args:
+            ts(array): parameters of funtion
+
+        Returns:
+            vector array: (媒介変数の数, 次元数)の位置
+        """
+        return np.dot(self.bsp.values(ts), self.axis.T)
+
     def diff(self):
         """Get diff function.
 
@@ -1,5 +1,7 @@
 import numpy as np
 import scipy.integrate as si
+import scipy.optimize as so
+from .profiler import count
 
 class Curvature:
     """ある2次元軌道の曲率を表します
@@ -68,6 +70,7 @@ class TotalCurvature:
         return np.abs(self._c(t)) * ((d[0] ** 2 + d[1] ** 2) ** 0.5)
 
     def __call__(self, from_t, to_t):
+        count("integrations")
         return si.quad(self._integrand, from_t, to_t, limit=100000)[0]
 
     def value(self, from_t, to_t):
@@ -80,3 +83,103 @@ class TotalCurvature:
             float: 軌道の曲率
         """
         return self(from_t, to_t)
+
+class AngleTotalCurvature:
+    """接線角の差からある関数の全曲率を計算します．
+
+    変曲点と変曲点の間では符号付き曲率の符号が変わらないため，
+    その間の全曲率 :math:`\\int |\\kappa| ds` は接線角 :math:`\\theta(t)` の変化量
+
+    .. math::
+
+        \\int_{t_0}^{t_1} |\\kappa| ds = |\\theta(t_1) - \\theta(t_0)|
+
+    に等しくなります．
+    そのため，数値積分をせずに微分値の評価だけで全曲率を計算できます．
+    接線角は区間内をn_samples点で評価してunwrapすることで，
+    :math:`\\pi` を超える回転も正しく扱います．
+
+    Warning:
+        区間内で曲率の符号が変わる(変曲点を含む)場合は正しい値になりません．
+
+    Attributes:
+        function (function): 2次元位置を返す関数
+        n_samples (int): 接線角をunwrapするために区間内で評価する点の数
+    """
+    def __init__(self, func, n_samples=256):
+        self.n_samples = n_samples
+        self.function = func
+
+    @property
+    def function(self):
+        """function: 軌道を表す関数"""
+        return self._func
+
+    @function.setter
+    def function(self, value):
+        self._func = value
+        self._d = self._func.diff()
+
+    def _derivatives(self, ts):
+        if hasattr(self._d, "values"):
+            return self._d.values(ts)
+        return np.array([self._d(t) for t in ts])
+
+    def angles(self, ts):
+        """unwrapされた接線角を計算します
+
+        Args:
+            ts (array): 単調に並んだ媒介変数の列
+
+        Returns:
+            array: 各媒介変数での接線角
+        """
+        d = self._derivatives(ts)
+        return np.unwrap(np.arctan2(d[:, 1], d[:, 0]))
+
+    def __call__(self, from_t, to_t):
+        a = self.angles(np.linspace(from_t, to_t, self.n_samples))
+        return np.abs(a[-1] - a[0])
+
+    def value(self, from_t, to_t):
+        """関数の値を取得します
+
+        Args:
+            from_t (float): 曲線の媒介変数(始点)
+            to_t (float): 曲線の媒介変数(終点)
+
+        Returns:
+            float: 軌道の全曲率
+        """
+        return self(from_t, to_t)
+
+    def inverse(self, from_t, to_t, target):
+        """from_tから測った全曲率がtargetになる媒介変数を探します
+
+        :math:`\\theta(t) = \\theta(t_{from}) \\pm target` を直接解きます.
+        to_tはfrom_tより小さくても構いません(その場合は逆向きに探します).
+
+        Args:
+            from_t (float): 全曲率を測り始める媒介変数
+            to_t (float): 探索範囲の端の媒介変数
+            target (float): 目標の全曲率.from_tからto_tまでの全曲率以下である必要があります.
+
+        Returns:
+            float: 全曲率がtargetになる媒介変数
+        """
+        ts = np.linspace(from_t, to_t, self.n_samples)
+        a = self.angles(ts)
+        g = np.abs(a - a[0]) - target
+        i = min(int(np.argmax(g >= 0.0)), len(ts) - 1)
+        if i == 0:
+            return from_t
+        if g[i] < 0.0:
+            return to_t
+
+        def h(t):
+            d = self._d(t)
+            da = np.arctan2(d[1], d[0]) - a[i]
+            da = (da + np.pi) % (2.0 * np.pi) - np.pi
+            return np.abs(a[i] + da - a[0]) - target
+        count("root_finds")
+        return so.brentq(h, ts[i - 1], ts[i])
@@ -0,0 +1,183 @@
+"""archive以下への書き込みを計算から切り離すためのモジュール
+
+各ステージの出力(jsonやcsvなど)は、全てこのモジュールの
+:py:func:`write_file` を通して書き込まれます.
+
+* 書き込みは一時ファイルに対して行い、書き終わってからrenameします.
+  そのため、途中で止まった場合でも書きかけのファイルがarchive以下に残ることはありません.
+* :py:func:`enable_async_writer` を呼ぶと、書き込みはバックグラウンドのスレッドで
+  行われるようになり、計算側は書き込みの完了を待たずに次へ進めます.
+  待ち行列の長さには上限があり、上限に達すると空きが出るまで待ちます
+  (メモリが際限なく増えることはありません).
+* 書き込み待ちのファイルを読み込む場合は、 :py:func:`wait_for` で
+  書き込みが終わるのを待ってから読み込みます.
+* プロセスの終了時には、残っている書き込みを全て終わらせます.
+
+Examples:
+    >>> enable_async_writer(max_pending=8)
+    >>> write_file('archive/axis/01.json', lambda path: save(path, obj))
+    >>> wait_for('archive/axis/01.json')  # 読み込む前に待つ
+"""
+import os
+import atexit
+import queue
+import threading
+
+def write_atomic(path, func):
+    """一時ファイルに書き込んでからrenameします
+
+    Args:
+        path (str): 書き込み先のファイルパス
+        func (function): ファイルパスを受け取り、そこに書き込む関数
+    """
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname, exist_ok=True)
+    tmp = os.path.join(
+        dirname,
+        f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        func(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+class ArchiveWriter:
+    """バックグラウンドのスレッドでファイルを書き込みます
+
+    Attributes:
+        max_pending (int): 書き込み待ちにできるファイルの数の上限
+
+    Args:
+        max_pending (int): 書き込み待ちにできるファイルの数の上限
+    """
+
+    def __init__(self, max_pending=8):
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            path, func = job
+            try:
+                write_atomic(path, func)
+            except BaseException as e:
+                self._error = e
+            finally:
+                with self._cond:
+                    self._pending[path] -= 1
+                    if self._pending[path] == 0:
+                        del self._pending[path]
+                    self._cond.notify_all()
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            e, self._error = self._error, None
+            raise e
+
+    def submit(self, path, func):
+        """書き込みを待ち行列に追加します
+
+        funcは後で別スレッドから呼ばれるため、
+        呼び出し後に変更されるデータを参照しないようにしてください.
+
+        Args:
+            path (str): 書き込み先のファイルパス
+            func (function): ファイルパスを受け取り、そこに書き込む関数
+        """
+        self._raise_error()
+        path = os.path.abspath(path)
+        with self._cond:
+            self._pending[path] = self._pending.get(path, 0) + 1
+        self._queue.put((path, func))
+
+    def wait_for(self, path):
+        """あるファイルの書き込みが終わるまで待ちます
+
+        Args:
+            path (str): ファイルパス
+        """
+        path = os.path.abspath(path)
+        with self._cond:
+            self._cond.wait_for(lambda: path not in self._pending)
+        self._raise_error()
+
+    def flush(self):
+        """全ての書き込みが終わるまで待ちます"""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """全ての書き込みを終わらせ、スレッドを止めます"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+_writer = None
+
+def enable_async_writer(max_pending=8):
+    """書き込みをバックグラウンドで行うようにします
+
+    Args:
+        max_pending (int): 書き込み待ちにできるファイルの数の上限
+
+    Returns:
+        ArchiveWriter: 書き込みを行うオブジェクト
+    """
+    global _writer
+    if _writer is None:
+        _writer = ArchiveWriter(max_pending)
+        atexit.register(disable_async_writer)
+    return _writer
+
+def disable_async_writer():
+    """残っている書き込みを終わらせ、同期的な書き込みに戻します"""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+def write_file(path, func):
+    """ファイルを書き込みます
+
+    バックグラウンドの書き込みが有効なら待ち行列に追加し、
+    そうでなければその場で書き込みます.いずれの場合もrenameにより書き込まれます.
+
+    Args:
+        path (str): 書き込み先のファイルパス
+        func (function): ファイルパスを受け取り、そこに書き込む関数
+    """
+    if _writer is None:
+        write_atomic(path, func)
+    else:
+        _writer.submit(path, func)
+
+def wait_for(path):
+    """あるファイルの書き込みが終わるまで待ちます
+
+    バックグラウンドの書き込みが無効なら何もしません.
+
+    Args:
+        path (str): ファイルパス
+    """
+    if _writer is not None:
+        _writer.wait_for(path)
+
+def flush():
+    """全ての書き込みが終わるまで待ちます"""
+    if _writer is not None:
+        _writer.flush()
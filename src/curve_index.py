@@ -0,0 +1,230 @@
+"""解析した曲線を1つのSQLiteデータベースにまとめるステージ
+
+archive/result, archive/similar, outputに分かれて保存されている曲線ごとの結果を、
+曲線を単位とした1つの表にまとめます.
+全てのファイルを読み込まなくても、「全ての軌道の中で評価値の高い曲線50本」のような問い合わせができます.
+
+表は次の2つです.
+
+* ``files``: 取り込んだ軌道のファイル.取り込んだ時点の各ファイルの更新時刻を保持し、
+  変更されていない軌道は次に取り込むときに読み飛ばします.
+* ``curves``: 曲線ごとの結果.(file, curve)が主キーで、scoreとfileに索引があります.
+
+類似度と評価値は、それぞれ次の曲線に対応付けます.
+
+* 類似度(archive/similar)のi行目: :py:func:`degree_of_similarity.similarity_targets` のi番目の曲線.
+* 評価値(output)のi行目: is_validがTrueのi番目の曲線
+  (:py:func:`evaluation_value_calc.value_calc` がそのように計算するため).
+
+Examples:
+    >>> index_curves('archive/index.sqlite', '01', 'archive/result/01.json',
+    ...              'archive/similar/01.csv', 'output/01.csv')
+    >>> top_curves('archive/index.sqlite', 50)
+
+    評価値の高い曲線を表示します.
+
+        $ python -m src.curve_index archive/index.sqlite --top 50
+"""
+import os
+import csv
+import sys
+import time
+import sqlite3
+import argparse
+import contextlib
+from .common.archive import load_archive
+from .common.writer import wait_for
+from .degree_of_similarity import similarity_targets
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY,
+    result_path TEXT,
+    signature TEXT,
+    n_curves INTEGER,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS curves (
+    file TEXT,
+    curve INTEGER,
+    plane TEXT,
+    is_valid INTEGER,
+    t_begin REAL,
+    t_inflection REAL,
+    t_end REAL,
+    trim_begin REAL,
+    trim_end REAL,
+    original_length_front REAL,
+    original_length_back REAL,
+    trim_length_front REAL,
+    trim_length_back REAL,
+    total_curvature_front REAL,
+    total_curvature_back REAL,
+    trimed_total_curvature_front REAL,
+    trimed_total_curvature_back REAL,
+    similarity_front REAL,
+    similarity_back REAL,
+    score REAL,
+    PRIMARY KEY (file, curve)
+);
+CREATE INDEX IF NOT EXISTS curves_score ON curves (score);
+CREATE INDEX IF NOT EXISTS curves_file ON curves (file);
+"""
+"""str: データベースの表と索引
+"""
+
+COLUMNS = [
+    "file", "curve", "plane", "is_valid",
+    "t_begin", "t_inflection", "t_end", "trim_begin", "trim_end",
+    "original_length_front", "original_length_back",
+    "trim_length_front", "trim_length_back",
+    "total_curvature_front", "total_curvature_back",
+    "trimed_total_curvature_front", "trimed_total_curvature_back",
+    "similarity_front", "similarity_back", "score"
+]
+"""List[str]: curvesの列
+"""
+
+def connect(dbpath):
+    """データベースに接続します.表が無ければ作ります
+
+    Args:
+        dbpath (str): データベースのファイルパス
+
+    Returns:
+        sqlite3.Connection: 接続
+    """
+    dirname = os.path.dirname(dbpath)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    conn = sqlite3.connect(dbpath, timeout=30.0)
+    conn.executescript(SCHEMA)
+    return conn
+
+def file_signature(paths):
+    """ファイルの更新時刻と大きさから、変更を調べるための文字列を作ります
+
+    Args:
+        paths (List[str]): ファイルパス
+
+    Returns:
+        str: 更新時刻と大きさを並べた文字列
+    """
+    stats = [os.stat(path) for path in paths]
+    return ";".join(f"{s.st_mtime_ns}:{s.st_size}" for s in stats)
+
+def read_rows(path):
+    """数値のcsvを読み込みます
+
+    Args:
+        path (str): ファイルパス
+
+    Returns:
+        List[List[float]]: 各行の値
+    """
+    with open(path, encoding="utf-8") as f:
+        return [[float(v) for v in row] for row in csv.reader(f) if row]
+
+def build_curve_rows(name, json_data, sims, scores):
+    """曲線ごとの行を作ります
+
+    Args:
+        name (str): 軌道の名前
+        json_data (dict): 解析結果
+        sims (List[List[float]]): 類似度の各行
+        scores (List[List[float]]): 評価値の各行
+
+    Returns:
+        List[tuple]: curvesに挿入する行
+    """
+    analysis = json_data["total_curvature_analysis"]
+    curves = analysis["curves"]
+    sim_of = {}
+    for row, (i, _, _, _) in zip(sims, similarity_targets(json_data)):
+        sim_of[i] = row
+    valid = [i for i, c in enumerate(curves) if str(c["is_valid"]) == "True"]
+    score_of = {i: row[0] for i, row in zip(valid, scores)}
+    rows = []
+    for i, c in enumerate(curves):
+        front, back = c["arcs"]
+        sim = sim_of.get(i, [None, None])
+        rows.append((
+            name, i, analysis.get("plane"), int(str(c["is_valid"]) == "True"),
+            c["ts"][0], c["ts"][1], c["ts"][2],
+            front["trim_ts"][0], back["trim_ts"][1],
+            front["original_length"], back["original_length"],
+            front["trim_length"], back["trim_length"],
+            front["total_curvature"], back["total_curvature"],
+            front["trimed_total_curvature"], back["trimed_total_curvature"],
+            sim[0], sim[1], score_of.get(i)
+        ))
+    return rows
+
+def index_curves(dbpath, name, rpath, spath, fpath):
+    """1つの軌道の曲線をデータベースに取り込みます
+
+    前に取り込んだときから3つのファイルが変更されていなければ何もしません.
+    変更されていれば、その軌道の曲線を全て入れ替えます.
+
+    Args:
+        dbpath (str): データベースのファイルパス
+        name (str): 軌道の名前
+        rpath (str): 解析結果のファイル
+        spath (str): 類似度のファイル
+        fpath (str): 評価値のファイル
+
+    Returns:
+        bool: 取り込んだ場合はTrue、変更が無く読み飛ばした場合はFalse
+    """
+    for path in (rpath, spath, fpath):
+        wait_for(path)
+    signature = file_signature([rpath, spath, fpath])
+    with contextlib.closing(connect(dbpath)) as conn:
+        row = conn.execute("SELECT signature FROM files WHERE file = ?", (name,)).fetchone()
+        if row is not None and row[0] == signature:
+            return False
+        rows = build_curve_rows(name, load_archive(rpath), read_rows(spath), read_rows(fpath))
+        with conn:
+            conn.execute("DELETE FROM curves WHERE file = ?", (name,))
+            conn.executemany(
+                f"INSERT INTO curves ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (name, rpath, signature, len(rows), time.time())
+            )
+    return True
+
+def top_curves(dbpath, n=50):
+    """評価値の高い曲線を返します
+
+    Args:
+        dbpath (str): データベースのファイルパス
+        n (int): 返す曲線の数
+
+    Returns:
+        List[dict]: 評価値の高い順の曲線
+    """
+    with contextlib.closing(connect(dbpath)) as conn:
+        cur = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM curves WHERE score IS NOT NULL "
+            "ORDER BY score DESC LIMIT ?",
+            (n,)
+        )
+        return [dict(zip(COLUMNS, row)) for row in cur.fetchall()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.curve_index")
+    parser.add_argument("db", help="データベースのファイルパス")
+    parser.add_argument("--top", type=int, default=50, help="表示する曲線の数")
+    args = parser.parse_args(argv)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["file", "curve", "score", "similarity_front", "similarity_back",
+                     "trim_length_front", "trim_length_back"])
+    for c in top_curves(args.db, args.top):
+        writer.writerow([c["file"], c["curve"], c["score"], c["similarity_front"],
+                         c["similarity_back"], c["trim_length_front"], c["trim_length_back"]])
+
+if __name__ == "__main__":
+    main()
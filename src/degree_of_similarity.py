@@ -2,19 +2,31 @@
     ホガースカーブと抽出された美の線尿素の類似度を計算するプログラム
     それぞれの曲線を変曲点で分け，前半と後半部分としている．
     前半と後半部分をそれぞれ50点でリサンプリングし，弧ごとに相関係数を計算し出力
+    method='spline'にすると，サンプル点の代わりに解析結果のB-splineを使い，
+    弧長で等間隔な点での曲率を解析的な微分から直接計算する(archive/bsplineは読まない)．
     出力はホガースカーブと美の線要素の類似度で，0~1の値で表される．
     1に近いほど類似度は大きい．
     弧ごとに計算しているので，出力は一つの美の線要素に対して2つである．
-    〜.py ~.csv (b-splineサンプル点が格納されたファイル名)  ~tca.json (美の線か否かが記述されたjsonファイル)
+    〜.py ~.csv (b-splineサンプル点が格納されたファイル名, .npyも可)  ~tca.json (美の線か否かが記述されたjsonファイル, .npzも可)
+    モジュールの変数や決まったパスの作業ファイルは使わないので，スレッドやプロセスから同時に呼び出せます．
 '''
 
+import os
+import functools
 import numpy as np
 import pandas as pd
-import json
 from scipy import interpolate
 from .common.parameter_to_frame import *
+from .common.archive import load_archive, load_samples
+from .common.writer import write_file
 
-data =[]
+HOGARTH_PATH = os.path.join(os.path.dirname(__file__), 'target', 'hogarth_curve_curvature.csv')
+
+#ホガースカーブの曲率を読み込む(一度読み込んだものを使い回す)
+@functools.lru_cache(maxsize=None)
+def load_hogarth_curvature(path=HOGARTH_PATH):
+    data_frame = pd.read_csv(path, header=None)
+    return tuple(data_frame.values.astype(float)[:, 0])
 
 #リサンプリングする
 def resample(t0, tf, dt, tra_x, tra_y, tra_z):
@@ -52,85 +64,137 @@ def curvature(data_cur, data_cur_ave, data_array, data_array2):
 
     return data_cur_ave
 
-def similarity(bpath, rpath, spath):
-    data_frame = pd.read_csv(bpath, header=None)
-    data_array = data_frame.values.astype(float)
-    json_tca = open(rpath, 'r')
-    json_data = json.load(json_tca)
+#類似度を計算する曲線の番号と，美の線要素の始まり・変曲点・終わりのフレームを返す
+#美の線要素の曲線のうち，変曲点の前後どちらかが5フレーム未満のものは計算しない
+def similarity_targets(json_data):
+    targets = []
     for i in range(0, len(json_data['total_curvature_analysis']['curves'])):
         t_or_f = str(json_data['total_curvature_analysis']['curves'][i]['is_valid'])
         if t_or_f == 'True':
-            mew1 = json_data['total_curvature_analysis']['curves'][i]['arcs'][0]['trimed_total_curvature']
-            mew2 = json_data['total_curvature_analysis']['curves'][i]['arcs'][1]['trimed_total_curvature']
-            if mew1 == None:
-                mew1 = json_data['total_curvature_analysis']['curves'][i]['arcs'][0]['total_curvature']
-            if mew2 == None:
-                mew2 = json_data['total_curvature_analysis']['curves'][i]['arcs'][1]['total_curvature']
             ip1, t1, t2, t3, ip2 = parameter_get(json_data, i)
             _, t_n_s, t_n_c, t_n_f, _ = frame_get(json_data, 0, ip1, t1, t2, t3, ip2)
-
             if not (t_n_c - t_n_s < 5 or t_n_f - t_n_c < 5):
-                tra_x, tra_y, tra_z = np.arange(0), np.arange(0), np.arange(0)
-                for s in range(t_n_s, t_n_c-3):
-                    tra_x = np.append(tra_x, data_array[(s, 0)])
-                    tra_y = np.append(tra_y, data_array[(s, 1)])
-                    tra_z = np.append(tra_z, data_array[(s, 2)])
-
-                front_tra_x_resample, front_tra_y_resample, front_tra_z_resample = resample(0, t_n_c-t_n_s-4, 1, tra_x, tra_y, tra_z)
-
-                tra_x, tra_y, tra_z = np.arange(0), np.arange(0), np.arange(0)
-                for s in range(t_n_c-3, t_n_f):
-                    tra_x = np.append(tra_x, data_array[(s, 0)])
-                    tra_y = np.append(tra_y, data_array[(s, 1)])
-                    tra_z = np.append(tra_z, data_array[(s, 2)])
-
-                back_tra_x_resample, back_tra_y_resample, back_tra_z_resample = resample(0, t_n_f - t_n_c+2, 1, tra_x, tra_y, tra_z)
-
-                data_front = diff(front_tra_x_resample, front_tra_y_resample, front_tra_z_resample)
-                data_back = diff(back_tra_x_resample, back_tra_y_resample, back_tra_z_resample)
-                data_fder = np.append(data_front, data_back, axis=0)
-
-                df=pd.DataFrame(data_fder)
-                df.to_csv("src/target/First_order_derivative.csv",header=False, index=False)
-
-                data_frame = pd.read_csv('src/target/First_order_derivative.csv', header = None)
-                darray = data_frame.values.astype(float)
-
-                data_sder = []
-                for j in range(0, len(darray)-1):
-                    x_sder = darray[(j+1, 0)] - darray[(j, 0)]
-                    y_sder = darray[(j+1, 1)] - darray[(j, 1)]
-                    z_sder = darray[(j+1, 2)] - darray[(j, 2)]
-                    data_sder.append([x_sder,y_sder,z_sder])
-
-                df=pd.DataFrame(data_sder)
-                df.to_csv("src/target/Second_order_derivative.csv",header=False, index=False)
-
-                data_frame = pd.read_csv('src/target/First_order_derivative.csv', header = None)
-                darray = data_frame.values.astype(float)
-                data_frame2 = pd.read_csv('src/target/Second_order_derivative.csv' , header = None)
-                data_array2 = data_frame2.values.astype(float)
-
-                data_cur_ave = curvature([], [], darray, data_array2)
-
-                data_frame = pd.read_csv('src/target/hogarth_curve_curvature.csv', header=None)
-                darray = data_frame.values.astype(float)
-
-                hogarth_data = []
-                for ttt in range(0, len(darray)):
-                    hogarth_data.append(darray[(ttt, 0)])
-
-                cor_f, cor_b, hog_f, hog_b = [], [], [], []
-                for cor in range(0, 49):
-                    cor_f.append(data_cur_ave[cor])
-                    hog_f.append(hogarth_data[cor])
-                    cor_b.append(data_cur_ave[cor+49])
-                    hog_b.append(hogarth_data[cor+49])
-
-                x_f = [cor_f, hog_f]
-                x_b = [cor_b, hog_b]
-
-                data.append([np.corrcoef(x_f)[0, 1],np.corrcoef(x_b)[0, 1]])
-
+                targets.append((i, t_n_s, t_n_c, t_n_f))
+    return targets
+
+#サンプル点と解析結果から類似度を計算し，曲線ごとに[前半, 後半]のリストで返す(ファイルは読み書きしない)
+def similarity_rows(data_array, json_data):
+    data = []
+    for i, t_n_s, t_n_c, t_n_f in similarity_targets(json_data):
+        tra_x, tra_y, tra_z = np.arange(0), np.arange(0), np.arange(0)
+        for s in range(t_n_s, t_n_c-3):
+            tra_x = np.append(tra_x, data_array[(s, 0)])
+            tra_y = np.append(tra_y, data_array[(s, 1)])
+            tra_z = np.append(tra_z, data_array[(s, 2)])
+
+        front_tra_x_resample, front_tra_y_resample, front_tra_z_resample = resample(0, t_n_c-t_n_s-4, 1, tra_x, tra_y, tra_z)
+
+        tra_x, tra_y, tra_z = np.arange(0), np.arange(0), np.arange(0)
+        for s in range(t_n_c-3, t_n_f):
+            tra_x = np.append(tra_x, data_array[(s, 0)])
+            tra_y = np.append(tra_y, data_array[(s, 1)])
+            tra_z = np.append(tra_z, data_array[(s, 2)])
+
+        back_tra_x_resample, back_tra_y_resample, back_tra_z_resample = resample(0, t_n_f - t_n_c+2, 1, tra_x, tra_y, tra_z)
+
+        data_front = diff(front_tra_x_resample, front_tra_y_resample, front_tra_z_resample)
+        data_back = diff(back_tra_x_resample, back_tra_y_resample, back_tra_z_resample)
+        data_fder = np.append(data_front, data_back, axis=0)
+
+        darray = data_fder
+
+        data_sder = []
+        for j in range(0, len(darray)-1):
+            x_sder = darray[(j+1, 0)] - darray[(j, 0)]
+            y_sder = darray[(j+1, 1)] - darray[(j, 1)]
+            z_sder = darray[(j+1, 2)] - darray[(j, 2)]
+            data_sder.append([x_sder,y_sder,z_sder])
+
+        data_array2 = np.array(data_sder)
+
+        data_cur_ave = curvature([], [], darray, data_array2)
+
+        hogarth_data = load_hogarth_curvature()
+
+        cor_f, cor_b, hog_f, hog_b = [], [], [], []
+        for cor in range(0, 49):
+            cor_f.append(data_cur_ave[cor])
+            hog_f.append(hogarth_data[cor])
+            cor_b.append(data_cur_ave[cor+49])
+            hog_b.append(hogarth_data[cor+49])
+
+        x_f = [cor_f, hog_f]
+        x_b = [cor_b, hog_b]
+
+        data.append([np.corrcoef(x_f)[0, 1],np.corrcoef(x_b)[0, 1]])
+
+    return data
+
+#各弧で弧長が等間隔になるnum個の媒介変数を返す
+#弧をn_fine個に分けた点で速さをまとめて評価し，台形則で積分した弧長の逆関数を線形補間する
+def arc_length_params(d1, ranges, num, n_fine=1024):
+    ranges = np.asarray(ranges, dtype=float)
+    w = np.linspace(0.0, 1.0, n_fine)
+    us = ranges[:, :1] + (ranges[:, 1:] - ranges[:, :1]) * w
+    speed = np.linalg.norm(d1.values(us.ravel()), axis=1).reshape(us.shape)
+    steps = (speed[:, 1:] + speed[:, :-1]) / 2 * np.diff(us, axis=1)
+    s = np.hstack((np.zeros((us.shape[0], 1)), np.cumsum(steps, axis=1)))
+    targets = np.linspace(0.0, 1.0, num)
+    params = []
+    for s_i, u_i in zip(s, us):
+        if s_i[-1] > 0.0:
+            params.append(np.interp(targets * s_i[-1], s_i, u_i))
+        else:
+            params.append(np.interp(targets, w, u_i))
+    return np.array(params)
+
+#2次元軌道のスプラインから，各弧で弧長が等間隔なnum点の曲率の絶対値を求める
+#微分は区間ごとの多項式を微分したものを使い，全ての弧の点をまとめて1回で評価する
+#両端の点を除いたnum-2点を返す(num=51のとき，samplesの方法と同じ49点になる)
+def spline_curvature_profiles(traj_func, ranges, num=51):
+    d1 = traj_func.diff()
+    d2 = d1.diff()
+    us = arc_length_params(d1, ranges, num)
+    d = d1.values(us.ravel())
+    dd = d2.values(us.ravel())
+    k = np.abs(d[:, 0] * dd[:, 1] - d[:, 1] * dd[:, 0]) / ((d[:, 0] ** 2 + d[:, 1] ** 2) ** 1.5)
+    return k.reshape(us.shape)[:, 1:-1]
+
+#解析結果のB-splineから類似度を計算し，曲線ごとに[前半, 後半]のリストで返す(ファイルは読み書きしない)
+def spline_similarity_rows(json_data, num=51):
+    from .total_curvature_analysis import build_bspline, build_projected_bsplines
+    targets = similarity_targets(json_data)
+    if len(targets) == 0:
+        return []
+    _, traj_func = build_projected_bsplines(
+        build_bspline(json_data['bspline']),
+        np.asarray(json_data['total_curvature_analysis']['axis'])
+    )
+    ranges = []
+    for i, _, _, _ in targets:
+        _, t1, t2, t3, _ = parameter_get(json_data, i)
+        ranges += [(t1, t2), (t2, t3)]
+    profiles = spline_curvature_profiles(traj_func, ranges, num)
+
+    hogarth_data = np.asarray(load_hogarth_curvature())
+    n = len(hogarth_data) // 2
+    hog_f, hog_b = hogarth_data[:n], hogarth_data[n:2 * n]
+    if profiles.shape[1] != n:
+        x = np.linspace(0.0, 1.0, profiles.shape[1])
+        profiles = np.array([np.interp(np.linspace(0.0, 1.0, n), x, p) for p in profiles])
+
+    data = []
+    for j in range(len(targets)):
+        data.append([np.corrcoef(profiles[2 * j], hog_f)[0, 1], np.corrcoef(profiles[2 * j + 1], hog_b)[0, 1]])
+    return data
+
+#method: 'samples'ならarchive/bsplineのサンプル点から，'spline'なら解析結果のB-splineから計算する('spline'のときbpathは使わない)
+def similarity(bpath, rpath, spath, method='samples', num=51):
+    if method == 'samples':
+        data = similarity_rows(load_samples(bpath), load_archive(rpath))
+    elif method == 'spline':
+        data = spline_similarity_rows(load_archive(rpath), num)
+    else:
+        raise ValueError('method is invalid: ' + str(method))
     df = pd.DataFrame(data)
-    df.to_csv(spath, header = False, index = False)
+    write_file(spath, lambda dst: df.to_csv(dst, header = False, index = False))
@@ -1,36 +1,49 @@
 '''
     美の線要素の評価値を計算するプログラム
     ホガースカーブとの類似度と両弧の弧長の比を考慮した式
-    〜.py 〜.csv（類似度が入ったファイル） ~tca.json
+    〜.py 〜.csv（類似度が入ったファイル） ~tca.json (.npzも可)
 '''
 
 import pandas as pd
 import math
-import json
+from .common.archive import load_archive
+from .common.writer import write_file, wait_for
 
-def value_calc(ipath, rpath, opath):
-    data_frame = pd.read_csv(ipath, header=None)
-    data_array = data_frame.values.astype(float)
-    json_tca = open(rpath, 'r')
-    json_data = json.load(json_tca)#jsonファイルを計算できる形する
+#1つの美の線要素の評価値を計算する(s1, s2は前半・後半の類似度，l1, l2は前半・後半の弧長)
+def curve_value(s1, s2, l1, l2):
+    d1 = (s1 + 1) / 2
+    d2 = (s2 + 1) / 2
+    length_ratio = abs((l1-l2)/(l1+l2))
+    return (l1 + l2) * math.exp(-(1-d1) -(1-d2) -length_ratio)#評価値の計算（ここが美の線要素評価モデルなので，好きにいじってみるとおもしろい）
+
+#類似度と解析結果から評価値を計算する(ファイルは読み書きしない)
+def calc_values(data_array, json_data):
     n = 0
+    values = []
     #弧長と両弧の比を考慮した評価値の計算
     for i in range(0, len(json_data['total_curvature_analysis']['curves'])):
         t_or_f = str(json_data['total_curvature_analysis']['curves'][i]['is_valid'])# 美の線ですか?
         if t_or_f == 'True':
-            data_frame = pd.read_csv(ipath, header=None)
-            data_array = data_frame.values.astype(float)
-            json_tca = open(rpath, 'r')
-            json_data = json.load(json_tca)#jsonファイルを計算できる形する
             l1 = json_data['total_curvature_analysis']['curves'][i]['arcs'][0]['trim_length']#美の線前半の弧長
             l2 = json_data['total_curvature_analysis']['curves'][i]['arcs'][1]['trim_length']#美の線後半の弧長
 
             if not (data_array[(n, 0)] == 'nan' or data_array[(n, 1)] == 'nan'):
-                d1 = (data_array[(n, 0)] + 1) / 2
-                d2 = (data_array[(n, 1)] + 1) / 2
-                length_ratio = abs((l1-l2)/(l1+l2))
-                eva_value = (l1 + l2) * math.exp(-(1-d1) -(1-d2) -length_ratio)#評価値の計算（ここが美の線要素評価モデルなので，好きにいじってみるとおもしろい）
+                eva_value = curve_value(data_array[(n, 0)], data_array[(n, 1)], l1, l2)
                 n = n + 1
-                with open(opath, 'a', encoding = 'utf-8') as f:
-                    f.write(str(eva_value))
-                    f.write('\n')
+                values.append(eva_value)
+    return values
+
+def value_calc(ipath, rpath, opath):
+    wait_for(ipath)
+    data_frame = pd.read_csv(ipath, header=None)
+    data_array = data_frame.values.astype(float)
+    json_data = load_archive(rpath)#jsonファイルを計算できる形する
+    values = [str(v) for v in calc_values(data_array, json_data)]
+
+    def write(dst):
+        with open(dst, 'w', encoding = 'utf-8') as f:
+            for v in values:
+                f.write(v)
+                f.write('\n')
+    write_file(opath, write)
+
@@ -0,0 +1,146 @@
+"""近似の前処理として、軌道から不要なフレームを取り除きます.
+
+マーカーがほとんど動いていないフレームや、同じ位置が続くフレームは、
+B-spline曲線の形には寄与しないにもかかわらず、
+LSPIAの1回の更新あたりの計算量(点の数m)を増やしてしまいます.
+ここでは、近似の前に次の処理を順に行います.
+
+* 重複したフレームの除去: 前のフレームと同じ位置、もしくはフレーム番号が増えていないフレーム.
+* 静止したフレームの除去: 前後のフレームとの距離がどちらもmin_move以下のフレーム.
+  静止している区間の始まりと終わりのフレームは残します.
+* 外れ値の除去(任意): 前後のフレームの中点からの距離が、
+  その中央値のoutlier_k倍(MADによる標準偏差の推定値の倍数)を超えるフレーム.
+* 弦長による間引き(任意): 残っているフレームを弦長で幅chord_tolごとの区間に分け、
+  各区間の最初のフレームだけを残します.
+
+端点のフレームは常に残します.
+処理は全て配列に対してまとめて行います.
+
+取り除いた後の軌道が元の入力の何行目に当たるかは"kept_index"として返し、
+近似結果の"preprocess"フィールドに保存します.
+近似結果の"parameter"や投影した軌道のサンプル点は残したフレームに対応するため、
+:py:func:`common.parameter_to_frame.original_frame_get` を使うと
+元の入力のフレームに戻すことができます.
+
+Examples:
+    >>> traj = load('input/01.csv')  # frame,x,y,z
+    >>> kept_traj, kept_index = preprocess(traj, min_move=0.1, chord_tol=1.0)
+    >>> traj[kept_index[10]]  # kept_traj[10]と同じフレーム
+"""
+import numpy as np
+
+def calc_steps(Q):
+    """隣り合うフレーム間の距離を計算します
+
+    Args:
+        Q (vector array): 位置の列
+
+    Returns:
+        array: 長さがフレーム数-1の距離
+    """
+    return np.linalg.norm(np.diff(Q, axis=0), axis=1)
+
+def keep_ends(keep):
+    """端点を残すようにします
+
+    Args:
+        keep (array): 残すかどうかのbool配列
+
+    Returns:
+        array: 端点をTrueにしたbool配列
+    """
+    keep[0] = True
+    keep[-1] = True
+    return keep
+
+def remove_duplicates(traj):
+    """重複したフレームを取り除きます
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+
+    Returns:
+        array: 残すフレームのbool配列
+    """
+    keep = np.ones(traj.shape[0], dtype=bool)
+    keep[1:] = (calc_steps(traj[:, 1:]) > 0.0) & (np.diff(traj[:, 0]) > 0.0)
+    return keep
+
+def remove_stationary(traj, min_move):
+    """静止したフレームを取り除きます
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        min_move (float): 1フレームあたりの移動量がこれ以下なら静止しているとみなします
+
+    Returns:
+        array: 残すフレームのbool配列
+    """
+    keep = np.ones(traj.shape[0], dtype=bool)
+    moved = calc_steps(traj[:, 1:]) > min_move
+    keep[1:-1] = moved[:-1] | moved[1:]
+    return keep_ends(keep)
+
+def remove_outliers(traj, outlier_k):
+    """外れ値のフレームを取り除きます
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        outlier_k (float): 前後の中点からの距離の中央値に対する倍数
+
+    Returns:
+        array: 残すフレームのbool配列
+    """
+    keep = np.ones(traj.shape[0], dtype=bool)
+    Q = traj[:, 1:]
+    dev = np.linalg.norm(Q[1:-1] - (Q[:-2] + Q[2:]) / 2.0, axis=1)
+    med = np.median(dev)
+    mad = np.median(np.abs(dev - med)) * 1.4826
+    if mad > 0.0:
+        keep[1:-1] = dev <= med + outlier_k * mad
+    return keep_ends(keep)
+
+def decimate_by_chord(traj, chord_tol):
+    """弦長で間引きます
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        chord_tol (float): 残すフレームの間の弦長のおおよその間隔
+
+    Returns:
+        array: 残すフレームのbool配列
+    """
+    s = np.hstack(([0.0], np.cumsum(calc_steps(traj[:, 1:]))))
+    bins = np.floor(s / chord_tol)
+    keep = np.ones(traj.shape[0], dtype=bool)
+    keep[1:] = np.diff(bins) > 0.0
+    return keep_ends(keep)
+
+def preprocess(traj, min_move=0.0, outlier_k=None, chord_tol=None):
+    """近似の前処理を行います
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        min_move (float): 静止しているとみなす1フレームあたりの移動量.
+            0なら重複したフレームだけを取り除きます.
+        outlier_k (float or None): 外れ値とみなす倍数.Noneなら外れ値を取り除きません.
+        chord_tol (float or None): 間引きに使う弦長.Noneなら間引きません.
+
+    Returns:
+        vector array, array: 残した軌道, 残したフレームが元の入力の何行目か
+    """
+    kept_index = np.arange(traj.shape[0])
+    steps = [remove_duplicates]
+    if min_move > 0.0:
+        steps.append(lambda tr: remove_stationary(tr, min_move))
+    if outlier_k is not None:
+        steps.append(lambda tr: remove_outliers(tr, outlier_k))
+    if chord_tol is not None:
+        steps.append(lambda tr: decimate_by_chord(tr, chord_tol))
+    for step in steps:
+        if traj.shape[0] < 3:
+            break
+        keep = step(traj)
+        traj = traj[keep]
+        kept_index = kept_index[keep]
+    return traj, kept_index
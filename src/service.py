@@ -0,0 +1,327 @@
+"""軌道を受け取って近似・解析・評価を行う常駐サービス
+
+main.pyを実行するたびに、インタプリタの起動とscipyやpandasなどのimportに時間がかかります.
+このモジュールは、ワーカープロセスをあらかじめ起動しておき(import済みで、
+ホガースカーブの曲率も読み込み済み)、HTTPで受け取った軌道をワーカーで処理して結果を返します.
+
+待ち受けはlocalhostのTCPポートか、Unixドメインソケットのどちらかです.
+同時に受け付けるリクエストの数には上限があり(ワーカー数 + 待ち行列の長さ)、
+上限を超えたリクエストには503を返します.
+
+エンドポイント
+
+* ``GET /health``: ワーカー数や処理中のリクエスト数を返します.
+* ``POST /score``: 軌道を処理して結果を返します.
+  本文はframe,x,y,zのcsv(Content-Type: text/csv)か、
+  ``{"trajectory": [[frame, x, y, z], ...], "options": {...}}`` のjsonです.
+  optionsには :py:data:`OPTIONS` の項目を指定できます.
+
+返すjsonは、近似結果("bspline")、解析結果("total_curvature_analysis")、
+類似度("similarity")、評価値("scores")を持ちます.
+類似度と評価値の各行は"scored_curves"の番号の曲線のものです.
+美の線要素でも類似度を計算できなかった(変曲点の前後が5フレーム未満の)曲線の番号は
+"unscored_curves"に入ります.
+
+Examples:
+    サービスを起動します(リポジトリのルートで実行します).
+
+        $ python -m src.service --port 8765 --workers 2 --max-queue 8
+        $ python -m src.service --socket /tmp/elegant-curve.sock
+
+    軌道を送ります.
+
+        $ curl -s --data-binary @input/01.csv -H 'Content-Type: text/csv' localhost:8765/score
+        $ curl -s --unix-socket /tmp/elegant-curve.sock --data-binary @input/01.csv localhost/score
+"""
+import os
+import io
+import csv
+import sys
+import json
+import argparse
+import threading
+import contextlib
+import socketserver
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from .approximate_trajectories import fit_trajectory
+from .total_curvature_analysis import analyze_trajectory
+from .degree_of_similarity import (
+    similarity_rows, spline_similarity_rows, similarity_targets, load_hogarth_curvature
+)
+from .evaluation_value_calc import curve_value
+from .common.archive import to_serializable
+
+OPTIONS = {
+    "name": "trajectory",
+    "average_error": 10,
+    "lr": 1e-3,
+    "weighting": "global",
+    "momentum": 0.0,
+    "coarse_factor": None,
+    "preprocess": None,
+    "curvature_method": "quad",
+    "similarity_method": "samples"
+}
+"""dict: リクエストで指定できる項目と既定値.
+"name"はファイル名の代わりで、舞踊名を含めると視点平面がそれに合わせて決まります.
+"""
+
+def init_worker():
+    """ワーカープロセスを初期化します
+
+    ホガースカーブの曲率を読み込んでおきます.
+    """
+    load_hogarth_curvature()
+
+def build_options(options):
+    """リクエストの項目に既定値を補います
+
+    Args:
+        options (dict): リクエストで指定された項目
+
+    Returns:
+        dict: 全ての項目
+
+    Raises:
+        ValueError: 指定できない項目があった場合に発生
+    """
+    unknown = set(options) - set(OPTIONS)
+    if unknown:
+        raise ValueError("unknown options: " + ", ".join(sorted(unknown)))
+    return dict(OPTIONS, **options)
+
+def parse_csv(text):
+    """frame,x,y,zのcsvを読み取ります.数値でない行は読み飛ばします
+
+    Args:
+        text (str): csvの文字列
+
+    Returns:
+        vector array: (frame, x, y, z)の列
+    """
+    traj = []
+    for row in csv.reader(io.StringIO(text)):
+        try:
+            traj.append([float(r) for r in row])
+        except ValueError:
+            pass
+    return np.array(traj)
+
+def score_trajectory(traj, options):
+    """軌道を近似・解析・評価します
+
+    ワーカープロセスで呼び出されます.ファイルには書き込まず、各ステージをメモリ上で実行します.
+
+    評価値は類似度を計算した曲線ごとに計算し、"scored_curves"にその曲線の番号を入れます.
+    美の線要素でも、変曲点の前後が短く類似度を計算できなかった曲線は"unscored_curves"に入ります.
+
+    Args:
+        traj (vector array): (frame, x, y, z)の列
+        options (dict): 全ての項目(:py:func:`build_options` の返り値)
+
+    Returns:
+        dict: 近似結果、解析結果、類似度、評価値
+    """
+    o = options
+    name = os.path.basename(str(o["name"]))
+    with open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull), \
+            contextlib.redirect_stderr(devnull):
+        result = fit_trajectory(
+            traj, o["average_error"], o["lr"],
+            weighting=o["weighting"], momentum=o["momentum"],
+            coarse_factor=o["coarse_factor"], preprocess=o["preprocess"]
+        )
+        result, samples = analyze_trajectory(result, name, o["curvature_method"])
+        if o["similarity_method"] == "spline":
+            sims = spline_similarity_rows(result)
+        else:
+            sims = similarity_rows(samples, result)
+    curves = result["total_curvature_analysis"]["curves"]
+    scored = [i for i, _, _, _ in similarity_targets(result)]
+    scores = [
+        curve_value(s[0], s[1], curves[i]["arcs"][0]["trim_length"], curves[i]["arcs"][1]["trim_length"])
+        for i, s in zip(scored, sims)
+    ]
+    return {
+        "bspline": result["bspline"],
+        "total_curvature_analysis": result["total_curvature_analysis"],
+        "similarity": sims,
+        "scores": scores,
+        "scored_curves": scored,
+        "unscored_curves": [
+            i for i, c in enumerate(curves) if c["is_valid"] and i not in scored
+        ]
+    }
+
+class ScoringService(object):
+    """ワーカープールと、同時に受け付けるリクエストの数を管理します
+
+    Attributes:
+        workers (int): ワーカープロセスの数
+        max_queue (int): ワーカーの空きを待てるリクエストの数
+
+    Args:
+        workers (int): ワーカープロセスの数
+        max_queue (int): ワーカーの空きを待てるリクエストの数
+    """
+    def __init__(self, workers=2, max_queue=8):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.active = 0
+        self._lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+        # 最初のリクエストを待たずにワーカーを起動しておきます
+        for f in [self._pool.submit(os.getpid) for _ in range(workers)]:
+            f.result()
+
+    def try_acquire(self):
+        """リクエストを受け付けられるか調べ、受け付ける場合は数を増やします
+
+        Returns:
+            bool: 受け付けられればTrue
+        """
+        with self._lock:
+            if self.active >= self.workers + self.max_queue:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        """処理の終わったリクエストの数を減らします"""
+        with self._lock:
+            self.active -= 1
+
+    def score(self, traj, options):
+        """ワーカーで軌道を処理します
+
+        Args:
+            traj (vector array): (frame, x, y, z)の列
+            options (dict): 全ての項目
+
+        Returns:
+            dict: 処理結果
+        """
+        return self._pool.submit(score_trajectory, traj, options).result()
+
+    def shutdown(self):
+        """ワーカープールを止めます"""
+        self._pool.shutdown()
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """HTTPのリクエストを処理します
+
+    サーバーのservice属性に :py:class:`ScoringService` が入っている必要があります.
+    """
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def send_json(self, status, obj):
+        body = json.dumps(obj, default=to_serializable).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_request(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            obj = json.loads(body)
+            traj = np.asarray(obj["trajectory"], dtype=float)
+            options = obj.get("options", {})
+        else:
+            traj = parse_csv(body)
+            options = {}
+        if traj.ndim != 2 or traj.shape[1] != 4 or traj.shape[0] < 6:
+            raise ValueError("trajectory must have at least 6 rows of frame,x,y,z")
+        return traj, build_options(options)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path != "/health":
+            self.send_json(404, {"error": "not found"})
+            return
+        self.send_json(200, {
+            "status": "ok",
+            "workers": service.workers,
+            "max_queue": service.max_queue,
+            "active": service.active
+        })
+
+    def do_POST(self):
+        service = self.server.service
+        if self.path != "/score":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            traj, options = self.read_request()
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        if not service.try_acquire():
+            self.send_json(503, {"error": "too many requests"})
+            return
+        try:
+            result = service.score(traj, options)
+        except Exception as e:
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            self.send_json(200, result)
+        finally:
+            service.release()
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unixドメインソケットで待ち受けるHTTPサーバー"""
+    daemon_threads = True
+
+def create_server(service, port=8765, socket_path=None):
+    """サーバーを作ります
+
+    Args:
+        service (ScoringService): リクエストを処理するサービス
+        port (int): localhostで待ち受けるポート
+        socket_path (str): Unixドメインソケットのパス.指定した場合はportを使いません.
+
+    Returns:
+        socketserver.BaseServer: サーバー
+    """
+    if socket_path is None:
+        server = ThreadingHTTPServer(("127.0.0.1", port), ScoringHandler)
+    else:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, ScoringHandler)
+    server.service = service
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.service")
+    parser.add_argument("--port", type=int, default=8765, help="localhostで待ち受けるポート")
+    parser.add_argument("--socket", default=None, help="Unixドメインソケットのパス")
+    parser.add_argument("--workers", type=int, default=2, help="ワーカープロセスの数")
+    parser.add_argument("--max-queue", type=int, default=8,
+                        help="ワーカーの空きを待てるリクエストの数")
+    args = parser.parse_args(argv)
+
+    service = ScoringService(args.workers, args.max_queue)
+    server = create_server(service, args.port, args.socket)
+    print(f"listening on {args.socket or f'127.0.0.1:{args.port}'}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""全曲率の閾値を変えながら評価値を比べるモジュール
+
+:py:data:`total_curvature_analysis.UNDER_TOTAL_CURVATURE` と
+:py:data:`total_curvature_analysis.BEST_TOTAL_CURVATURE` を変えて試すたびに
+main.pyを実行し直すと、変曲点の探索や全曲率の数値積分を毎回やり直すことになります.
+変曲点、各弧の全曲率、トリミング前の弧長は閾値に依らないため、
+ここではそれらを :py:class:`total_curvature_analysis.Arc` として一度だけ計算し
+(解析結果のファイルがあればそこから読み込み)、
+閾値の組ごとに美の線要素の判定、トリミング、類似度、評価値だけを計算し直します.
+
+閾値の組は、BEST_TOTAL_CURVATUREの値ごとにまとめてプロセス並列で計算します.
+トリミング位置とトリミング後の弧長はBEST_TOTAL_CURVATUREだけで決まるため、
+同じBEST_TOTAL_CURVATUREを持つ組の間で使い回します.
+
+結果は閾値の組ごとに1行の表(csv)になります.
+
+Examples:
+    >>> cache = prepare('archive/axis/01.json', 'quad', 'archive/result/01.json')
+    >>> rows = sweep(cache, np.deg2rad([40, 50]), np.deg2rad([70, 75, 80]), workers=4)
+
+    コマンドラインからは角度を度で指定します.
+
+        $ python -m src.threshold_sweep archive/axis/01.json --result archive/result/01.json \\
+              --under 40 45 50 --best 70 75 80 --workers 4 --output archive/sweep/01.csv
+"""
+import csv
+import sys
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .total_curvature_analysis import (
+    UNDER_TOTAL_CURVATURE, BEST_TOTAL_CURVATURE, get_viewport_axis, build_bspline,
+    build_projected_bsplines, build_total_curvature, calc_inflection_points,
+    Arc, build_arcs, CurveRecord
+)
+from .degree_of_similarity import similarity_rows
+from .evaluation_value_calc import calc_values
+from .common.archive import load_archive
+from .common.writer import write_file
+
+COLUMNS = [
+    "under", "best", "n_curves", "n_valid", "n_similarity", "n_scored",
+    "score_sum", "score_mean", "score_max", "error"
+]
+"""List[str]: 結果の表の列.underとbestは度で表します.
+"""
+
+def arcs_from_result(pbsp, total_curvature_func, json_data):
+    """解析結果から、計算済みの全曲率と弧長を持つ弧を作ります
+
+    弧長の入っていない弧は、:py:func:`prepare` で計算します.
+
+    Args:
+        pbsp (ProjectedBSpline): 投影された軌道
+        total_curvature_func (TotalCurvature or AngleTotalCurvature): 全曲率を計算する関数
+        json_data (dict): 解析結果
+
+    Returns:
+        List[Arc]: 弧
+    """
+    curves = json_data["total_curvature_analysis"]["curves"]
+    if len(curves) == 0:
+        return []
+    lengths = {}
+    for c in curves:
+        for a in c["arcs"]:
+            if a["original_length"] is not None:
+                lengths[tuple(a["original_ts"])] = a["original_length"]
+    arcs = [c["arcs"][0] for c in curves] + [curves[-1]["arcs"][1]]
+    return [
+        Arc(
+            pbsp, total_curvature_func, *a["original_ts"],
+            total_curvature=a["total_curvature"],
+            length=lengths.get(tuple(a["original_ts"]))
+        )
+        for a in arcs
+    ]
+
+def prepare(apath, method="quad", rpath=None):
+    """閾値に依らない量を計算します
+
+    Args:
+        apath (str): 近似結果のファイル
+        method (str): 全曲率の計算方法("quad"もしくは"angle").
+            rpathを指定する場合は、解析したときと同じものにして下さい(トリミング位置の探索に使います).
+        rpath (str): 解析結果のファイル.指定した場合、変曲点と各弧の全曲率・弧長をここから読み込みます.
+            視点方向も解析したときのもの("total_curvature_analysis"の"axis")を使います.
+
+    Returns:
+        dict: :py:func:`sweep` に渡す値
+    """
+    json_data = load_archive(apath)
+    param = np.asarray(json_data["bspline"]["parameter"])
+    if rpath is not None:
+        # viewport_planesなどで解析した場合に備えて、解析結果と同じ視点方向に投影します
+        result = load_archive(rpath)
+        axis = np.asarray(result["total_curvature_analysis"]["axis"], dtype=float)
+    else:
+        axis = get_viewport_axis(apath)
+    pbb, traj_func = build_projected_bsplines(build_bspline(json_data["bspline"]), axis)
+    total_curvature_func = build_total_curvature(traj_func, method)
+    if rpath is not None:
+        arcs = arcs_from_result(traj_func, total_curvature_func, result)
+    else:
+        inf_points = calc_inflection_points(traj_func)
+        if 0.0 not in inf_points:
+            inf_points.insert(0, 0.0)
+        if 1.0 not in inf_points:
+            inf_points.append(1.0)
+        arcs = build_arcs(traj_func, total_curvature_func, inf_points)
+    # 各プロセスで計算し直さないように、全曲率と弧長はここで計算しておきます
+    for arc in arcs:
+        arc.total_curvature
+        arc.length
+    return {
+        "parameter": param.tolist(),
+        "samples": pbb.values(param),
+        "arcs": arcs
+    }
+
+def evaluate(cache, curves):
+    """トリミングした曲線から類似度と評価値を計算します
+
+    Args:
+        cache (dict): :py:func:`prepare` の返り値
+        curves (List[dict]): 各S字状カーブの解析結果
+
+    Returns:
+        List[List[float]], List[float]: 類似度, 評価値.
+            評価値を計算できなかった場合(類似度の行が足りない場合)、評価値はNoneです.
+    """
+    json_data = {
+        "bspline": {"parameter": cache["parameter"]},
+        "total_curvature_analysis": {"curves": curves}
+    }
+    sims = similarity_rows(cache["samples"], json_data)
+    try:
+        scores = calc_values(np.array(sims), json_data)
+    except IndexError:
+        scores = None
+    return sims, scores
+
+def sweep_best(cache, best, unders):
+    """BEST_TOTAL_CURVATUREを1つ決めて、各UNDER_TOTAL_CURVATUREについて評価します
+
+    最も小さいUNDER_TOTAL_CURVATUREで一度だけトリミングし、
+    それより大きいUNDER_TOTAL_CURVATUREでは美の線要素でなくなった曲線だけを作り直します.
+    プロセス並列で呼び出せるように、モジュールレベルの関数にしています.
+
+    Args:
+        cache (dict): :py:func:`prepare` の返り値
+        best (float): BEST_TOTAL_CURVATURE
+        unders (List[float]): UNDER_TOTAL_CURVATUREの列
+
+    Returns:
+        List[dict]: 各UNDER_TOTAL_CURVATUREの結果の行
+    """
+    arcs = cache["arcs"]
+    base = [
+        CurveRecord(arc_begin, arc_end, min(unders), best)
+        for arc_begin, arc_end in zip(arcs, arcs[1:])
+    ]
+    rows = []
+    for under in unders:
+        curves = [
+            (c if c.is_valid and min(a.total_curvature for a in c.arcs) >= under else
+             CurveRecord(c.arcs[0], c.arcs[1], under, best)).to_dict()
+            for c in base
+        ]
+        sims, scores = evaluate(cache, curves)
+        row = {
+            "under": np.rad2deg(under),
+            "best": np.rad2deg(best),
+            "n_curves": len(curves),
+            "n_valid": sum(1 for c in curves if c["is_valid"]),
+            "n_similarity": len(sims),
+            "n_scored": None,
+            "score_sum": None,
+            "score_mean": None,
+            "score_max": None,
+            "error": None
+        }
+        if scores is None:
+            row["error"] = "fewer similarity rows than valid curves"
+        else:
+            row["n_scored"] = len(scores)
+            if len(scores) > 0:
+                row["score_sum"] = float(np.sum(scores))
+                row["score_mean"] = float(np.mean(scores))
+                row["score_max"] = float(np.max(scores))
+        rows.append(row)
+    return rows
+
+def sweep(cache, unders, bests, workers=1):
+    """閾値の組ごとに評価します
+
+    Args:
+        cache (dict): :py:func:`prepare` の返り値
+        unders (List[float]): UNDER_TOTAL_CURVATUREの列(ラジアン)
+        bests (List[float]): BEST_TOTAL_CURVATUREの列(ラジアン)
+        workers (int): プロセス数.1なら逐次実行します.
+
+    Returns:
+        List[dict]: 閾値の組ごとの結果の行(bestの順、その中でunderの順)
+    """
+    unders = sorted(unders)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(sweep_best, itertools.repeat(cache), bests,
+                                  itertools.repeat(unders)))
+    else:
+        results = [sweep_best(cache, best, unders) for best in bests]
+    return [row for rows in results for row in rows]
+
+def save_table(path, rows):
+    """結果の表をcsvで保存します
+
+    Args:
+        path (str): 保存先のファイルパス
+        rows (List[dict]): :py:func:`sweep` の返り値
+    """
+    def write(dst):
+        with open(dst, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    write_file(path, write)
+
+def format_table(rows):
+    """結果の表を表示用の文字列にします
+
+    Args:
+        rows (List[dict]): :py:func:`sweep` の返り値
+
+    Returns:
+        str: 表
+    """
+    def fmt(v):
+        if v is None:
+            return "-"
+        if isinstance(v, float):
+            return f"{v:.4g}"
+        return str(v)
+    cells = [COLUMNS] + [[fmt(row[c]) for c in COLUMNS] for row in rows]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(COLUMNS))]
+    return "\n".join(
+        "  ".join(v.rjust(w) for v, w in zip(r, widths)).rstrip() for r in cells
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.threshold_sweep")
+    parser.add_argument("axis", help="近似結果のファイル(archive/axis/...)")
+    parser.add_argument("--result", default=None,
+                        help="解析結果のファイル(archive/result/...).指定すると変曲点と全曲率を読み込みます")
+    parser.add_argument("--under", type=float, nargs="+",
+                        default=[np.rad2deg(UNDER_TOTAL_CURVATURE)], help="全曲率の下限値(度)")
+    parser.add_argument("--best", type=float, nargs="+",
+                        default=[np.rad2deg(BEST_TOTAL_CURVATURE)], help="取り出す全曲率(度)")
+    parser.add_argument("--method", default="quad", choices=["quad", "angle"], help="全曲率の計算方法")
+    parser.add_argument("--workers", type=int, default=1, help="プロセス数")
+    parser.add_argument("--output", default=None, help="結果の表を保存するcsvファイル")
+    args = parser.parse_args(argv)
+
+    cache = prepare(args.axis, args.method, args.result)
+    rows = sweep(cache, np.deg2rad(args.under), np.deg2rad(args.best), args.workers)
+    print(format_table(rows), file=sys.stdout)
+    if args.output is not None:
+        save_table(args.output, rows)
+
+if __name__ == "__main__":
+    main()
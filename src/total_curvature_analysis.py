@@ -23,6 +23,8 @@ jsonデータとして格納することです.
     取り出されたS字状カーブに対して、curve_analysis関数でさらに解析を行います.
     この関数では、まず全曲率を各S字状カーブについて計算します.
     全曲率については :py:mod:`total_curvature` を参照してください.
+    全曲率は曲率の数値積分(method="quad")の他に、
+    変曲点間の接線角の差(method="angle")から数値積分無しで計算することもできます.
     その後、UNDER_TOTAL_CURVATURE、BEST_TOTAL_CURVATURE変数をもとに、
     全曲率がUNDER_TOTAL_CURVATURE以上、BEST_TOTAL_CURVATURE以下になるように、
     S字状カーブをトリミングし、美の線要素を取り出します.
@@ -129,6 +131,7 @@ jsonデータとして格納することです.
     "trimed_total_curvature"はトリミング後の全曲率です.
     "original_length"はトリミング前の弧長、
     "trim_length"はトリミング後の弧長です.
+    弧長は美の線要素でない曲線については計算せず、Noneが入ります.
     様々なデータに一貫して言えることですが、
     "is_trimed"がTrueではない場合
     (つまり、全曲率がBEST_TOTAL_CURVATUREより小さくトリミングされなかった場合)、
@@ -156,15 +159,17 @@ Options:
     -h, --help  Show this help
 """
 import json
-import csv
 import numpy as np
 from tqdm import tqdm
 import scipy.optimize as so
 import scipy.integrate as si
 from .bspline.base import BSpline
-from .common.projected_bspline import ProjectedBSpline
-from .common.total_curvature import Curvature, TotalCurvature
+from .bspline.polynomial import PiecewisePolynomial, compile_bspline
+from .common.projected_bspline import project_bspline
+from .common.total_curvature import Curvature, TotalCurvature, AngleTotalCurvature
 from .common.viewport import get_plane_matrix
+from .common.archive import load_archive, save_archive, save_samples
+from .common.profiler import count
 
 UNDER_TOTAL_CURVATURE = np.deg2rad(50.0)
 """float: 取り出す全曲率の下限値
@@ -173,7 +178,6 @@ UNDER_TOTAL_CURVATURE = np.deg2rad(50.0)
 BEST_TOTAL_CURVATURE = np.deg2rad(75.0)
 """float: 全曲率がこの値になるように取り出されます．
 """
-cr_num = 0
 
 class SecondDimensionalize:
     """３次元軌道を2次元上に落とします
@@ -181,6 +185,10 @@ class SecondDimensionalize:
     3次元軌道のうち，0,1要素を取り出すことで2次元軌道の関数にします．
     何か特別な何かをすることで2次元化するわけではありません．
 
+    Note:
+        解析では、投影と合わせて制御点に畳み込んだ
+        :py:func:`build_projected_bsplines` を使っています.
+
     Args:
         func (function): 3次元軌道の関数
 
@@ -280,6 +288,17 @@ def get_viewport_axis(filename):
     """
     dancename = get_dancename(filename.lower())
     axis_str = build_viewport_axis_str(dancename)
+    return get_axis_matrix(axis_str)
+
+def get_axis_matrix(axis_str):
+    """視点平面を表す文字列から視点方向の行列を返します
+
+    Args:
+        axis_str (str): 視点平面を表す文字列("xy", "-zy"など)
+
+    Returns:
+        matrix: 視点方向を表す行列.3行目は視線方向です.
+    """
     axis_matrix = get_plane_matrix(axis_str)
     return np.r_[
         axis_matrix,
@@ -322,8 +341,10 @@ def calc_inflection_points(pbsp, trange=None, n_splits=None, ts=None):
         ts = np.linspace(trange[0], trange[1], n_splits)
     dsts = []
     for a, b in tqdm(zip(ts, ts[1:])):
+        count("root_brackets")
         try:
             dsts.append(so.brentq(cf, a, b))
+            count("root_finds")
         except ValueError as e:
             pass
     return dsts
@@ -336,6 +357,7 @@ def search_trim_point(total_curvature_func, ts):
                                          この値が0になる場所を探索します
         ts (list[float]): 探索範囲
     """
+    count("root_finds")
     return so.brentq(total_curvature_func, ts[0], ts[1])
 
 def calc_length(pbsp, trange):
@@ -350,28 +372,207 @@ def calc_length(pbsp, trange):
     """
     diff = pbsp.diff()
     length_func = (lambda t: np.sum(diff(t) * diff(t)) ** 0.5)
+    count("integrations")
     length, err = si.quad(length_func, trange[0], trange[1], limit=10000)
     return length
 
-def set_length_field(func, arc_dict):
-    """ある解析結果について、長さに関するフィールドを埋めます
+def build_total_curvature(pbsp, method):
+    """全曲率を計算する関数オブジェクトを作ります
 
-    Note:
-        この関数には副作用があります.
-        arc_dictを汚染します.
+    Args:
+        pbsp (ProjectedBSpline): 投影された軌道
+        method (str): "quad"なら曲率を数値積分します.
+            "angle"なら変曲点間の接線角の差から計算します.
+
+    Returns:
+        TotalCurvature or AngleTotalCurvature: 全曲率を計算する関数
+
+    Raises:
+        ValueError: methodが不正な場合に発生
+    """
+    if method == "quad":
+        return TotalCurvature(pbsp)
+    elif method == "angle":
+        return AngleTotalCurvature(pbsp)
+    raise ValueError("method is invalid: " + str(method))
+
+def search_trim_point_from(total_curvature_func, t_from, t_to, target=BEST_TOTAL_CURVATURE):
+    """t_fromから測った全曲率がtargetになる点を探します
+
+    Args:
+        total_curvature_func (TotalCurvature or AngleTotalCurvature): 全曲率を計算する関数
+        t_from (float): 全曲率を測り始める媒介変数(変曲点)
+        t_to (float): 探索範囲の端の媒介変数
+        target (float): 取り出す全曲率.既定値はBEST_TOTAL_CURVATURE
+
+    Returns:
+        float: 切り取るべき媒介変数
+    """
+    if isinstance(total_curvature_func, AngleTotalCurvature):
+        return total_curvature_func.inverse(t_from, t_to, target)
+    if t_to < t_from:
+        tc_func = (
+            lambda t: (
+                total_curvature_func(t, t_from) -
+                target
+            )
+        )
+        return search_trim_point(tc_func, (t_to, t_from))
+    tc_func = (
+        lambda t: (
+            total_curvature_func(t_from, t) -
+            target
+        )
+    )
+    return search_trim_point(tc_func, (t_from, t_to))
+
+class Arc(object):
+    """変曲点から変曲点までの弧
+
+    全曲率と弧長は初めて参照したときに計算し、覚えておきます.
+    隣り合うS字状カーブは弧を1つ共有するため、同じArcを渡せば計算は1回で済みます.
+
+    Attributes:
+        ts (Tuple[float]): 弧の始点と終点の媒介変数
+
+    Args:
+        pbsp (ProjectedBSpline): 投影された軌道
+        total_curvature_func (TotalCurvature or AngleTotalCurvature): 全曲率を計算する関数
+        t_from (float): 弧の始点の媒介変数
+        t_to (float): 弧の終点の媒介変数
+        total_curvature (float): 計算済みの全曲率.Noneなら参照したときに計算します.
+        length (float): 計算済みの弧長.Noneなら参照したときに計算します.
+    """
+    def __init__(self, pbsp, total_curvature_func, t_from, t_to, total_curvature=None, length=None):
+        self.pbsp = pbsp
+        self.total_curvature_func = total_curvature_func
+        self.ts = (t_from, t_to)
+        self._total_curvature = total_curvature
+        self._length = length
+
+    @property
+    def total_curvature(self):
+        """float: 弧の全曲率"""
+        if self._total_curvature is None:
+            self._total_curvature = self.total_curvature_func(*self.ts)
+        return self._total_curvature
+
+    @property
+    def length(self):
+        """float: 弧長"""
+        if self._length is None:
+            self._length = calc_length(self.pbsp, self.ts)
+        return self._length
+
+def build_arcs(pbsp, total_curvature_func, inf_points):
+    """変曲点の間の弧を作ります.この時点では何も計算しません
 
     Args:
-        func (function): 長さを計算する軌道
-        arc_dict (dict): 長さを保存するディレクトリ
+        pbsp (ProjectedBSpline): 投影された軌道
+        total_curvature_func (TotalCurvature or AngleTotalCurvature): 全曲率を計算する関数
+        inf_points (List[float]): 端点を含む変曲点の媒介変数
 
     Returns:
-        dict: arc_dictと同じものです
+        List[Arc]: 弧
     """
-    arc_dict["original_length"] = calc_length(func, arc_dict["original_ts"])
-    arc_dict["trim_length"] = calc_length(func, arc_dict["trim_ts"])
-    return arc_dict
+    return [
+        Arc(pbsp, total_curvature_func, t_from, t_to)
+        for t_from, t_to in zip(inf_points, inf_points[1:])
+    ]
 
-def curve_analysis(pbsp, tb, tc, te):
+class CurveRecord(object):
+    """ある軌道(S字状カーブ)の解析結果
+
+    美の線要素かどうかの判定、トリミング位置、トリミング後の弧長は
+    初めて参照したときに計算し、覚えておきます.
+    判定は前の弧の全曲率から調べ、下限値に満たなければ後の弧は調べません.
+    美の線要素でない曲線はトリミングしないため、トリミング後の弧長は元の弧長と同じ値になります.
+
+    Attributes:
+        arcs (Tuple[Arc]): 変曲点の前後の弧
+        under (float): 取り出す全曲率の下限値
+        best (float): 全曲率がこの値になるように取り出します
+
+    Args:
+        arc_begin (Arc): 変曲点の前の弧
+        arc_end (Arc): 変曲点の後の弧
+        under (float): 取り出す全曲率の下限値
+        best (float): 全曲率がこの値になるように取り出します
+    """
+    def __init__(self, arc_begin, arc_end, under=UNDER_TOTAL_CURVATURE, best=BEST_TOTAL_CURVATURE):
+        self.arcs = (arc_begin, arc_end)
+        self.under = under
+        self.best = best
+        self._is_valid = None
+        self._trim_ts = None
+        self._trim_lengths = None
+
+    @property
+    def ts(self):
+        """Tuple[float]: 始点、変曲点、終点の媒介変数"""
+        return self.arcs[0].ts + self.arcs[1].ts[1:]
+
+    @property
+    def is_valid(self):
+        """bool: 美の線要素ならTrue"""
+        if self._is_valid is None:
+            self._is_valid = all(arc.total_curvature >= self.under for arc in self.arcs)
+        return self._is_valid
+
+    @property
+    def trim_ts(self):
+        """List[Tuple[float]]: 各弧のトリミング範囲.美の線要素でなければ元の範囲です."""
+        if self._trim_ts is None:
+            tb, tc, te = self.ts
+            if not self.is_valid:
+                self._trim_ts = [(tb, tc), (tc, te)]
+            else:
+                arc_begin, arc_end = self.arcs
+                tb_dash, te_dash = tb, te
+                if arc_begin.total_curvature >= self.best:
+                    tb_dash = search_trim_point_from(arc_begin.total_curvature_func, tc, tb, self.best)
+                if arc_end.total_curvature >= self.best:
+                    te_dash = search_trim_point_from(arc_end.total_curvature_func, tc, te, self.best)
+                self._trim_ts = [(tb_dash, tc), (tc, te_dash)]
+        return self._trim_ts
+
+    @property
+    def trim_lengths(self):
+        """List[float]: 各弧のトリミング後の弧長"""
+        if self._trim_lengths is None:
+            self._trim_lengths = [
+                arc.length if trim_ts == arc.ts else calc_length(arc.pbsp, trim_ts)
+                for arc, trim_ts in zip(self.arcs, self.trim_ts)
+            ]
+        return self._trim_lengths
+
+    def to_dict(self):
+        """jsonに格納する形式にします
+
+        Returns:
+            dict: 解析結果を格納したディクショナリ
+        """
+        valid = self.is_valid
+        arcs = []
+        for i, arc in enumerate(self.arcs):
+            is_trimed = bool(valid and arc.total_curvature >= self.best)
+            arcs.append({
+                "original_ts": arc.ts,
+                "trim_ts": self.trim_ts[i],
+                "total_curvature": arc.total_curvature,
+                "is_trimed": is_trimed,
+                "trimed_total_curvature": self.best if is_trimed else None,
+                "original_length": arc.length,
+                "trim_length": self.trim_lengths[i]
+            })
+        return {
+            "ts": self.ts,
+            "is_valid": valid,
+            "arcs": arcs
+        }
+
+def curve_analysis(pbsp, tb, tc, te, method="quad", under=UNDER_TOTAL_CURVATURE,
+                   best=BEST_TOTAL_CURVATURE):
     """ある軌道(S字状カーブ)を解析します
 
     Args:
@@ -379,88 +580,28 @@ def curve_analysis(pbsp, tb, tc, te):
         tb (float): 解析の始点を表す媒介変数
         tc (float): 変曲点を表す媒介変数
         te (float): 解析の終点を表す媒介変数
+        method (str): 全曲率の計算方法("quad"もしくは"angle")
+        under (float): 取り出す全曲率の下限値
+        best (float): 全曲率がこの値になるように取り出します
 
     Returns:
         dict: 解析結果を格納したディクショナリ
     """
-    total_curvature_func = TotalCurvature(pbsp)
-    curve = {
-        "ts": (tb, tc, te),
-        "is_valid": None,
-        "arcs": []
-    }
-    total_curvature_begin = total_curvature_func(tb, tc)
-    arc_begin = {
-        "original_ts": (tb, tc),
-        "trim_ts": None,
-        "total_curvature": total_curvature_begin,
-        "is_trimed": False,
-        "trimed_total_curvature": None
-    }
-    total_curvature_end = total_curvature_func(tc, te)
-    arc_end = {
-        "original_ts": (tc, te),
-        "trim_ts": None,
-        "total_curvature": total_curvature_end,
-        "is_trimed": False,
-        "trimed_total_curvature": None
-    }
-    if (total_curvature_begin >= UNDER_TOTAL_CURVATURE and
-            total_curvature_end >= UNDER_TOTAL_CURVATURE):
-        curve["is_valid"] = True
-        if total_curvature_begin >= BEST_TOTAL_CURVATURE:
-            tc_func = (
-                lambda t: (
-                    total_curvature_func(t, tc) -
-                    BEST_TOTAL_CURVATURE
-                )
-            )
-            tb_dash = search_trim_point(
-                tc_func,
-                (tb, tc)
-            )
-            arc_begin["is_trimed"] = True
-            arc_begin["trimed_total_curvature"] = BEST_TOTAL_CURVATURE
-        else:
-            tb_dash = tb
-        arc_begin["trim_ts"] = (tb_dash, tc)
-
-        if total_curvature_end >= BEST_TOTAL_CURVATURE:
-            tc_func = (
-                lambda t: (
-                    total_curvature_func(tc, t) -
-                    BEST_TOTAL_CURVATURE
-                )
-            )
-            te_dash = search_trim_point(
-                tc_func,
-                (tc, te)
-            )
-            arc_end["is_trimed"] = True
-            arc_end["trimed_total_curvature"] = BEST_TOTAL_CURVATURE
-        else:
-            te_dash = te
-        arc_end["trim_ts"] = (tc, te_dash)
-    else:
-        arc_begin["trim_ts"] = (tb, tc)
-        arc_end["trim_ts"] = (tc, te)
-        curve["is_valid"] = False
-    arc_begin = set_length_field(pbsp, arc_begin)
-    curve["arcs"].append(arc_begin)
-    arc_end = set_length_field(pbsp, arc_end)
-    curve["arcs"].append(arc_end)
-    return curve
-
-def analysis(pbsp):
+    arc_begin, arc_end = build_arcs(pbsp, build_total_curvature(pbsp, method), [tb, tc, te])
+    return CurveRecord(arc_begin, arc_end, under, best).to_dict()
+
+def analysis(pbsp, method="quad"):
     """軌道データ全体を解析します
 
+    隣り合うS字状カーブで弧を共有するため、各弧の全曲率と弧長の計算は1回だけです.
+
     Args:
         pbsp (projected_bspline.ProjectedBSpline): 軌道
+        method (str): 全曲率の計算方法("quad"もしくは"angle")
 
     Returns:
         dict: 解析結果
     """
-    global cr_num
     dst = {
         "desc": ("total_curvature_analysisによって作られたデータ\n" +
                  "変曲点3つを一つのS字とし，ホガースの示した美の線に近づくように一部を取り出すような処理をします．"),
@@ -472,11 +613,11 @@ def analysis(pbsp):
         inf_points.insert(0, 0.0)
     if 1.0 not in inf_points:
         inf_points.append(1.0)
-    for tb, tc, te in tqdm(zip(inf_points, inf_points[1:], inf_points[2:])):
+    arcs = build_arcs(pbsp, build_total_curvature(pbsp, method), inf_points)
+    for arc_begin, arc_end in tqdm(zip(arcs, arcs[1:])):
         dst["curves"].append(
-             curve_analysis(pbsp, tb, tc, te)
+             CurveRecord(arc_begin, arc_end).to_dict()
         )
-    cr_num = len(dst["curves"])
     return dst
 
 def build_bspline(bspline_dict):
@@ -494,31 +635,114 @@ def build_bspline(bspline_dict):
         np.array(bspline_dict["control_point"])
     )
 
-def analyze_curvature(apath, bpath, rpath):
-    """main関数
+def build_projected_bsplines(bsp, axis):
+    """投影した軌道と、それを2次元に落とした軌道を構築します
+
+    ProjectedBSpline、SecondDimensionalizeと同じ軌道を、
+    投影を制御点に畳み込んだBSplineを、
+    さらにノット区間ごとの多項式に変換して返します
+    (:py:mod:`bspline.polynomial` を参照).
 
     Args:
-        input_arg (str): 入力ファイルもしくはディレクトリ
-        output_arg (str): 出力ファイルもしくはディレクトリ
+        bsp (bspline.base.BSpline): 3次元軌道
+        axis (matrix): 視点方向を表す行列
+
+    Returns:
+        PiecewisePolynomial, PiecewisePolynomial: 投影した3次元軌道, 2次元軌道
     """
-    global cr_num
-    json_data = load_json(apath)
-    param = json_data['bspline']['parameter']
-    traj_func = SecondDimensionalize(
-        ProjectedBSpline(
+    pbsp = project_bspline(bsp, axis)
+    return (
+        compile_bspline(pbsp),
+        compile_bspline(BSpline(pbsp.h, pbsp.knots, pbsp.ctrls[:, :2]))
+    )
+
+def build_multi_projected_bsplines(bsp, axes):
+    """複数の視点方向について、投影した軌道をまとめて構築します
+
+    3次元軌道をノット区間ごとの多項式に一度だけ変換し、
+    全ての視点方向の行列を縦に並べて、多項式の係数との行列積を一度だけ計算します.
+
+    Args:
+        bsp (bspline.base.BSpline): 3次元軌道
+        axes (List[matrix]): 視点方向を表す行列のリスト
+
+    Returns:
+        List[Tuple[PiecewisePolynomial, PiecewisePolynomial]]:
+            各視点方向の(投影した3次元軌道, 2次元軌道)
+    """
+    pp = compile_bspline(bsp)
+    coefs = np.dot(pp.coefs, np.vstack(axes).T)
+    dsts = []
+    for i in range(len(axes)):
+        pcoefs = coefs[:, :, 3 * i:3 * i + 3]
+        dsts.append((
+            PiecewisePolynomial(pp.breaks, pcoefs),
+            PiecewisePolynomial(pp.breaks, pcoefs[:, :, :2])
+        ))
+    return dsts
+
+def analyze_trajectory(json_data, filename, method="quad", planes=None):
+    """近似結果を解析します(ファイルは読み書きしません)
+
+    Args:
+        json_data (dict): 近似結果.解析結果のフィールドが追加されます.
+        filename (str): 舞踊名を含むファイル名.planesがNoneの場合、これで視点平面が決まります.
+        method (str): 全曲率の計算方法("quad"もしくは"angle")
+        planes (List[str]): 視点平面のリスト.Noneの場合、filenameの舞踊名から決まる視点平面だけを解析します.
+
+    Returns:
+        dict, vector array: 解析結果を追加したjson_data, 先頭の視点平面に投影した軌道のサンプル点
+    """
+    param = np.asarray(json_data['bspline']['parameter'])
+    if planes is None:
+        axis = get_viewport_axis(filename)
+        pbb, traj_func = build_projected_bsplines(
             build_bspline(json_data["bspline"]),
-            get_viewport_axis(apath)
+            axis
         )
-    )
+        samples = pbb.values(param)
+
+        result = analysis(traj_func, method)
+        result["axis"] = axis.tolist()
+        json_data["total_curvature_analysis"] = result
+    else:
+        axes = [get_axis_matrix(plane) for plane in planes]
+        projected = build_multi_projected_bsplines(
+            build_bspline(json_data["bspline"]),
+            axes
+        )
+        samples = projected[0][0].values(param)
+
+        results = {}
+        for plane, axis, (_, traj_func) in zip(planes, axes, projected):
+            result = analysis(traj_func, method)
+            result["axis"] = axis.tolist()
+            result["plane"] = plane
+            results[plane] = result
+        json_data["total_curvature_analysis"] = results[planes[0]]
+        json_data["total_curvature_analyses"] = results
+    return json_data, samples
+
+def analyze_curvature(apath, bpath, rpath, method="quad", planes=None):
+    """main関数
+
+    入出力の形式はファイルの拡張子(.jsonもしくは.npz)で決まります.
+
+    planesに視点平面のリストを与えた場合、3次元軌道を一度だけ構築し、
+    各視点平面に投影した軌道をそれぞれ解析します.
+    解析結果は"total_curvature_analyses"フィールドに視点平面の文字列をキーとして並べ、
+    先頭の視点平面の結果は従来通り"total_curvature_analysis"にも格納します.
+    bpathに出力されるサンプル点は先頭の視点平面のものです.
 
-    pbb = ProjectedBSpline(build_bspline(json_data['bspline']),get_viewport_axis(apath))
-    with open(bpath, 'w', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        for i in range(len(param)):
-            writer.writerow(pbb(param[i]))
-
-    result = analysis(traj_func)
-    result["axis"] = traj_func.func.axis.tolist()
-    json_data["total_curvature_analysis"] = result
-    with open(rpath, "w", encoding="utf-8") as f:
-        json.dump(json_data, f, sort_keys=True, indent=4)
\ No newline at end of file
+    Args:
+        apath (str): 近似結果のファイル
+        bpath (str): 投影した軌道のサンプル点を出力するファイル(.csvもしくは.npy)
+        rpath (str): 解析結果を出力するファイル
+        method (str): 全曲率の計算方法.
+            "quad"なら曲率を数値積分し、"angle"なら接線角の差から計算します.
+        planes (List[str]): 視点平面のリスト(["xy", "-zy", "yz"]など).
+            Noneの場合、ファイル名の舞踊名から決まる視点平面だけを解析します.
+    """
+    json_data, samples = analyze_trajectory(load_archive(apath), apath, method, planes)
+    save_samples(bpath, samples)
+    save_archive(rpath, json_data)